@@ -5,21 +5,25 @@ for the BNB Chain Biotech Platform
 """
 import os
 import asyncio
+import importlib
 import logging
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timezone
 import hashlib
-import json
+from functools import lru_cache
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, status
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, field_validator
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_validator, model_validator
 import httpx
-import modal
+import orjson
+
+from storage import init_store, get_store, close_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,7 +35,8 @@ app = FastAPI(
     description="AI-powered genomic sequence analysis for BNB Chain biotech platform",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware for frontend integration
@@ -43,32 +48,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Modal.com app reference (your existing setup)
-modal_app_name = "variant-analysis-evo2-BNB"
+# Concurrency budget for outbound RPC calls so bursts don't trip rate limits
+# (Modal calls are capped inside the Modal client)
+RPC_SEM = asyncio.Semaphore(int(os.getenv("RPC_CONCURRENCY", "4")))
+
+# Background tasks waiting on mint receipts
+RECEIPT_WORKERS = int(os.getenv("RECEIPT_WORKERS", "4"))
+
+# Byte lookup table of valid (uppercase) IUPAC nucleotide codes
+VALID_SEQUENCE_CHARS = b"ATCGNRYSWKMBDHV-"
+
+# Deletion table for hex digits: a valid address body translates to ""
+_HEX_DELETE_TABLE = str.maketrans("", "", "0123456789abcdefABCDEF")
+
+def _validate_address(address: str) -> str:
+    """Cheap 0x-prefixed 20-byte hex address check (no regex)"""
+    if len(address) != 42 or not address.startswith("0x") or address[2:].translate(_HEX_DELETE_TABLE):
+        raise ValueError("Invalid Ethereum address")
+    return address
 
 # Pydantic models for API
 class SequenceAnalysisRequest(BaseModel):
     sequence: str = Field(..., min_length=10, max_length=50000, description="DNA sequence to analyze")
     gene_name: Optional[str] = Field(None, max_length=100, description="Gene name (e.g., BRCA1)")
     description: Optional[str] = Field(None, max_length=500, description="Analysis description")
-    contributor_address: Optional[str] = Field(None, pattern=r"^0x[a-fA-F0-9]{40}$", description="Ethereum wallet address")
+    contributor_address: Optional[str] = Field(None, description="Ethereum wallet address")
+
+    # Uppercased ASCII bytes of the sequence, encoded once during validation
+    _sequence_bytes: bytes = PrivateAttr(default=b"")
 
-    @field_validator('sequence')
+    @field_validator('contributor_address')
     @classmethod
-    def validate_sequence(cls, v):
-        # Basic DNA sequence validation
-        valid_chars = set('ATCGNRYSWKMBDHV-')
-        if not all(c.upper() in valid_chars for c in v):
+    def validate_contributor_address(cls, v):
+        return v if v is None else _validate_address(v)
+
+    @model_validator(mode='after')
+    def validate_sequence(self):
+        # Basic DNA sequence validation: deleting every valid byte must leave nothing
+        sequence = self.sequence.upper()
+        try:
+            data = sequence.encode('ascii')
+        except UnicodeEncodeError:
+            raise ValueError('Invalid DNA sequence characters')
+        if data.translate(None, VALID_SEQUENCE_CHARS):
             raise ValueError('Invalid DNA sequence characters')
-        return v.upper()
+        self.sequence = sequence
+        self._sequence_bytes = data
+        return self
+
+    @property
+    def sequence_bytes(self) -> bytes:
+        return self._sequence_bytes
 
 class QualityScore(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
     overall_score: float = Field(..., ge=0, le=100, description="Overall quality score (0-100)")
     confidence: float = Field(..., ge=0, le=1, description="Confidence level (0-1)")
     variant_impact: Optional[str] = Field(None, description="Predicted variant impact")
     functional_prediction: Optional[str] = Field(None, description="Functional prediction")
 
 class AnalysisResult(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
     analysis_id: str = Field(..., description="Unique analysis identifier")
     sequence_hash: str = Field(..., description="SHA256 hash of input sequence")
     quality_score: QualityScore
@@ -77,67 +119,180 @@ class AnalysisResult(BaseModel):
     processing_time: float = Field(..., description="Processing time in seconds")
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     ready_for_minting: bool = Field(..., description="Whether result is ready for NFT minting")
+    mint_status: Optional[Dict[str, Any]] = Field(None, description="Latest NFT mint status, if a mint was submitted")
 
 class NFTMintingRequest(BaseModel):
     analysis_id: str = Field(..., description="Analysis ID from previous analysis")
-    contributor_address: str = Field(..., pattern=r"^0x[a-fA-F0-9]{40}$")
+    contributor_address: str = Field(..., description="Ethereum wallet address")
     ipfs_metadata_uri: Optional[str] = Field(None, description="IPFS URI for metadata")
 
-# In-memory storage for demo (replace with Redis/database in production)
-analysis_results: Dict[str, AnalysisResult] = {}
+    @field_validator('contributor_address')
+    @classmethod
+    def validate_contributor_address(cls, v):
+        return _validate_address(v)
+
+@app.on_event("startup")
+async def startup():
+    """Open shared connection pools"""
+    # Dependency report is informational only; don't hold up startup for it
+    from start_api import check_dependencies
+    asyncio.get_running_loop().run_in_executor(None, check_dependencies)
+    # Import the analysis client (and its fallback kernel's numba warm-up) in a thread
+    # now, rather than on the event loop inside the first /api/analyze request
+    await asyncio.to_thread(importlib.import_module, "modal_integration")
+    await init_store()
+    # One keep-alive HTTP/2 pool for outbound calls (IPFS pinning, etc.)
+    app.state.http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=30.0
+    )
+    # Submitted mints are confirmed off the request path
+    app.state.mint_queue = asyncio.Queue()
+    app.state.reward_queue = asyncio.Queue()
+    app.state.mint_workers = [
+        asyncio.create_task(receipt_worker(app.state.mint_queue, app.state.reward_queue))
+        for _ in range(RECEIPT_WORKERS)
+    ]
+    # Rewards are eventually-consistent accounting; one consumer keeps transfers orderly
+    app.state.mint_workers.append(asyncio.create_task(reward_worker(app.state.reward_queue)))
+    # Keep a fresh gas price and new-block notifications for mint/reward transactions
+    if os.getenv("PRIVATE_KEY"):
+        try:
+            from blockchain import get_blockchain_instance
+            get_blockchain_instance().start_background_tasks()
+        except ImportError as e:
+            logger.warning(f"Blockchain module not available: {e}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close shared connection pools"""
+    for task in app.state.mint_workers:
+        task.cancel()
+    await asyncio.gather(*app.state.mint_workers, return_exceptions=True)
+    try:
+        from blockchain import close_blockchain_instance, close_ipfs_integration
+        await close_blockchain_instance()
+        await close_ipfs_integration()
+    except ImportError:
+        pass
+    from modal_integration import close_modal_client
+    await close_modal_client()
+    await app.state.http_client.aclose()
+    await close_store()
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Dependency returning the app-wide HTTP client"""
+    return request.app.state.http_client
+
+def get_mint_queue(request: Request) -> asyncio.Queue:
+    """Dependency returning the queue of mints awaiting confirmation"""
+    return request.app.state.mint_queue
+
+async def confirm_mint(
+    reward_queue: asyncio.Queue,
+    analysis_id: str,
+    tx_hash: str,
+    analysis_result: Dict[str, Any],
+    contributor_address: str,
+    with_rewards: bool
+):
+    """Wait for a mint receipt, record the outcome and queue the rewards"""
+    from blockchain import get_blockchain_instance
+    
+    mint_status = await get_blockchain_instance().wait_for_mint_receipt(tx_hash)
+    mint_status["analysis_id"] = analysis_id
+    
+    queue_rewards = mint_status["success"] and with_rewards
+    if queue_rewards:
+        mint_status["rewards_status"] = "pending"
+    
+    await get_store().set_mint_status(analysis_id, tx_hash, orjson.dumps(mint_status))
+    logger.info(f"Mint {tx_hash} for analysis {analysis_id}: {mint_status['status']}")
+    
+    if queue_rewards:
+        reward_queue.put_nowait({
+            "mint_status": mint_status,
+            "analysis_result": analysis_result,
+            "contributor_address": contributor_address
+        })
 
-def generate_analysis_id(sequence: str, gene_name: str = None) -> str:
+async def distribute_rewards(
+    mint_status: Dict[str, Any],
+    analysis_result: Dict[str, Any],
+    contributor_address: str
+):
+    """Send the token rewards for a confirmed mint and record them on its status"""
+    from blockchain import get_blockchain_instance, distribute_minting_rewards
+    
+    async with RPC_SEM:
+        mint_status["rewards"] = await distribute_minting_rewards(
+            analysis_result, contributor_address, get_blockchain_instance()
+        )
+    mint_status["rewards_status"] = "distributed"
+    
+    await get_store().set_mint_status(
+        mint_status["analysis_id"], mint_status["transaction_hash"], orjson.dumps(mint_status)
+    )
+    
+    # Cached balances go stale once the transfers land, not when they're sent
+    blockchain_client = get_blockchain_instance()
+    tx_hashes = [
+        reward["transaction_hash"]
+        for reward in (mint_status["rewards"]["analysis_reward"], mint_status["rewards"]["mint_reward"])
+        if reward.get("success") and reward.get("transaction_hash")
+    ]
+    await asyncio.gather(*(
+        blockchain_client.invalidate_balance_when_mined(contributor_address, tx_hash)
+        for tx_hash in tx_hashes
+    ))
+
+async def receipt_worker(queue: asyncio.Queue, reward_queue: asyncio.Queue):
+    """Consume submitted mints until cancelled on shutdown"""
+    while True:
+        job = await queue.get()
+        try:
+            await confirm_mint(reward_queue, **job)
+        except Exception as e:
+            logger.error(f"Mint confirmation failed for analysis {job.get('analysis_id')}: {e}")
+        finally:
+            queue.task_done()
+
+async def reward_worker(queue: asyncio.Queue):
+    """Consume confirmed mints owed rewards until cancelled on shutdown"""
+    while True:
+        job = await queue.get()
+        try:
+            await distribute_rewards(**job)
+        except Exception as e:
+            logger.error(f"Reward distribution failed for analysis {job['mint_status'].get('analysis_id')}: {e}")
+        finally:
+            queue.task_done()
+
+def generate_analysis_id(sequence: bytes, gene_name: str = None) -> str:
     """Generate unique analysis ID"""
-    content = f"{sequence}_{gene_name}_{datetime.now(timezone.utc).isoformat()}"
-    return hashlib.sha256(content.encode()).hexdigest()[:16]
+    # Feed the sequence bytes straight into the hash instead of building one big string
+    h = hashlib.sha256(sequence)
+    h.update(f"_{gene_name}_{datetime.now(timezone.utc).isoformat()}".encode())
+    return h.digest()[:8].hex()
 
-def calculate_sequence_hash(sequence: str) -> str:
-    """Calculate SHA256 hash of sequence"""
-    return hashlib.sha256(sequence.encode()).hexdigest()
+# Bounded so a burst of distinct 50kb sequences can't pin much memory
+@lru_cache(maxsize=512)
+def _sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
 
-async def call_modal_function(function_name: str, **kwargs) -> Dict[str, Any]:
-    """Call Modal.com function and return results"""
-    try:
-        # This would call your Modal.com deployed function
-        # For now, we'll simulate the call
-        logger.info(f"Calling Modal.com function: {function_name}")
-        
-        # Simulate Modal.com processing time
-        await asyncio.sleep(2)
-        
-        # Simulate Evo2 analysis results
-        if function_name == "analyze_sequence":
-            sequence = kwargs.get("sequence", "")
-            
-            # Mock quality scoring based on sequence length and composition
-            gc_content = (sequence.count('G') + sequence.count('C')) / len(sequence) if sequence else 0
-            length_score = min(len(sequence) / 1000, 1.0) * 30  # Up to 30 points for length
-            gc_score = (1 - abs(gc_content - 0.5) * 2) * 30  # Up to 30 points for optimal GC content
-            complexity_score = min(len(set(sequence)) / 4, 1.0) * 40  # Up to 40 points for complexity
-            
-            overall_score = length_score + gc_score + complexity_score
-            confidence = min(overall_score / 100, 0.95)
-            
-            return {
-                "quality_score": {
-                    "overall_score": round(overall_score, 2),
-                    "confidence": round(confidence, 3),
-                    "variant_impact": "moderate" if overall_score > 60 else "low",
-                    "functional_prediction": "likely_pathogenic" if overall_score > 80 else "uncertain"
-                },
-                "gene_annotations": {
-                    "gc_content": round(gc_content, 3),
-                    "length": len(sequence),
-                    "complexity": len(set(sequence))
-                },
-                "processing_successful": True
-            }
-        
-        return {"error": "Unknown function"}
-        
-    except Exception as e:
-        logger.error(f"Modal.com function call failed: {e}")
-        raise HTTPException(status_code=500, detail=f"AI analysis failed: {str(e)}")
+def calculate_sequence_hash(sequence: bytes) -> str:
+    """Calculate SHA256 hash of sequence (memoized for re-submitted sequences)"""
+    return _sha256_hex(sequence)
+
+# Sequences at least this long are hashed in a worker thread
+HASH_IN_THREAD_MIN_LENGTH = 32768
+
+async def calculate_sequence_hash_async(sequence: bytes) -> str:
+    """Calculate SHA256 hash of sequence without holding up the event loop for long inputs"""
+    if len(sequence) >= HASH_IN_THREAD_MIN_LENGTH:
+        return await asyncio.to_thread(calculate_sequence_hash, sequence)
+    return calculate_sequence_hash(sequence)
 
 @app.get("/", response_model=Dict[str, str])
 async def root():
@@ -177,18 +332,22 @@ async def analyze_sequence(request: SequenceAnalysisRequest, background_tasks: B
     
     try:
         # Generate unique analysis ID
-        analysis_id = generate_analysis_id(request.sequence, request.gene_name)
-        sequence_hash = calculate_sequence_hash(request.sequence)
+        sequence_bytes = request.sequence_bytes
+        analysis_id = generate_analysis_id(sequence_bytes, request.gene_name)
         
-        logger.info(f"Starting analysis {analysis_id} for sequence of length {len(request.sequence)}")
+        logger.info(f"Starting analysis {analysis_id} for sequence of length {len(sequence_bytes)}")
         
         # Call Enhanced Modal.com Evo2 analysis
         from modal_integration import run_evo2_analysis
         
-        modal_result = await run_evo2_analysis(
-            sequence=request.sequence,
-            gene_name=request.gene_name,
-            analysis_type="quality_score"
+        # Hashing doesn't depend on the AI result, so run it alongside the Modal call
+        sequence_hash, modal_result = await asyncio.gather(
+            calculate_sequence_hash_async(sequence_bytes),
+            run_evo2_analysis(
+                sequence=request.sequence,
+                gene_name=request.gene_name,
+                analysis_type="quality_score"
+            )
         )
         
         if not modal_result.get("processing_successful"):
@@ -213,14 +372,18 @@ async def analyze_sequence(request: SequenceAnalysisRequest, background_tasks: B
                 "gene_name": request.gene_name,
                 "description": request.description,
                 "contributor_address": request.contributor_address,
-                "sequence_length": len(request.sequence)
+                "sequence_length": len(sequence_bytes)
             },
             processing_time=processing_time,
             ready_for_minting=ready_for_minting
         )
         
         # Store result for later retrieval
-        analysis_results[analysis_id] = analysis_result
+        await get_store().save_analysis(
+            analysis_id,
+            analysis_result.model_dump_json(exclude={"mint_status"}),
+            analysis_result.timestamp
+        )
         
         logger.info(f"Analysis {analysis_id} completed with score {quality_score.overall_score}")
         
@@ -232,32 +395,55 @@ async def analyze_sequence(request: SequenceAnalysisRequest, background_tasks: B
 
 @app.get("/api/analysis/{analysis_id}", response_model=AnalysisResult)
 async def get_analysis_result(analysis_id: str):
-    """Retrieve analysis result by ID"""
-    if analysis_id not in analysis_results:
+    """Retrieve analysis result by ID (including mint progress, if any)"""
+    payload, mint_status = await get_store().get_analysis_with_mint_status(analysis_id)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Analysis not found")
     
-    return analysis_results[analysis_id]
+    # Stored payloads were validated on write; serve them as-is instead of re-parsing
+    if mint_status is not None:
+        payload = f'{payload[:-1]},"mint_status":{mint_status}}}'
+    return Response(content=payload, media_type="application/json")
 
 @app.get("/api/analyses", response_model=List[AnalysisResult])
-async def list_analyses(limit: int = 10, offset: int = 0):
+async def list_analyses(
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
     """List recent analyses"""
-    all_results = list(analysis_results.values())
-    # Sort by timestamp (newest first)
-    sorted_results = sorted(all_results, key=lambda x: x.timestamp, reverse=True)
-    return sorted_results[offset:offset + limit]
+    # Redis keeps the index sorted by timestamp (newest first)
+    payloads = await get_store().list_analyses(limit=limit, offset=offset)
+    return Response(content=f"[{','.join(payloads)}]", media_type="application/json")
 
-@app.post("/api/mint-nft")
-async def mint_nft(request: NFTMintingRequest, background_tasks: BackgroundTasks):
+@app.get("/api/mint/{tx_hash}")
+async def get_mint_status(tx_hash: str):
+    """Retrieve the status of a submitted mint transaction"""
+    mint_status = await get_store().get_mint_status_by_tx(tx_hash)
+    if mint_status is None:
+        raise HTTPException(status_code=404, detail="Mint transaction not found")
+    
+    return Response(content=mint_status, media_type="application/json")
+
+@app.post("/api/mint-nft", status_code=status.HTTP_202_ACCEPTED)
+async def mint_nft(
+    request: NFTMintingRequest,
+    background_tasks: BackgroundTasks,
+    http_client: httpx.AsyncClient = Depends(get_http_client),
+    mint_queue: asyncio.Queue = Depends(get_mint_queue)
+):
     """
     Mint NFT for high-quality genomic analysis
     
-    This endpoint integrates with your deployed smart contracts
+    This endpoint integrates with your deployed smart contracts. It returns as
+    soon as the mint transaction is sent; confirmation and token rewards are
+    handled in the background and reported via GET /api/analysis/{analysis_id}.
     """
     # Get analysis result
-    if request.analysis_id not in analysis_results:
+    payload = await get_store().get_analysis(request.analysis_id)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Analysis not found")
     
-    analysis = analysis_results[request.analysis_id]
+    analysis = AnalysisResult.model_validate_json(payload)
     
     if not analysis.ready_for_minting:
         raise HTTPException(
@@ -267,59 +453,71 @@ async def mint_nft(request: NFTMintingRequest, background_tasks: BackgroundTasks
     
     # Use blockchain integration for actual NFT minting with rewards
     try:
-        from blockchain import process_nft_minting_with_rewards, BlockchainIntegration
+        from blockchain import mint_and_reward
         
-        # Initialize blockchain client with private key from environment
-        private_key = os.getenv("PRIVATE_KEY")
-        if not private_key:
+        # Rewards need a private key to sign the token transfers
+        with_rewards = bool(os.getenv("PRIVATE_KEY"))
+        if not with_rewards:
             logger.warning("No private key configured - using basic minting without rewards")
-            from blockchain import process_nft_minting_with_blockchain
-            minting_result = await process_nft_minting_with_blockchain(
-                analysis.model_dump(), 
-                request.contributor_address
-            )
-        else:
-            # Use enhanced minting with automatic rewards
-            blockchain_client = BlockchainIntegration(private_key)
-            minting_result = await process_nft_minting_with_rewards(
-                analysis.model_dump(), 
+        
+        analysis_data = analysis.model_dump(exclude={"mint_status"})
+        async with RPC_SEM:
+            # Submit only; rewards follow confirmation in the receipt workers
+            minting_result = await mint_and_reward(
+                analysis_data, 
                 request.contributor_address,
-                blockchain_client
+                with_rewards=False,
+                http_client=http_client
             )
         
-        # Calculate total rewards earned
-        rewards_info = minting_result.get("rewards", {})
-        total_tokens = rewards_info.get("total_tokens_earned", 0)
-        analysis_reward = rewards_info.get("analysis_reward", {}).get("reward_amount", 0)
-        mint_reward = rewards_info.get("mint_reward", {}).get("reward_amount", 0)
-        quality_bonus = rewards_info.get("analysis_reward", {}).get("quality_bonus", 0)
+        tx_hash = minting_result.get("transaction_hash")
+        if minting_result["minting_successful"]:
+            await get_store().set_mint_status(
+                request.analysis_id,
+                tx_hash,
+                orjson.dumps({
+                    "status": "pending",
+                    "transaction_hash": tx_hash,
+                    "analysis_id": request.analysis_id
+                })
+            )
+            await mint_queue.put({
+                "analysis_id": request.analysis_id,
+                "tx_hash": tx_hash,
+                "analysis_result": analysis_data,
+                "contributor_address": request.contributor_address,
+                "with_rewards": with_rewards
+            })
         
         return {
-            "message": "NFT minted successfully with automated rewards",
+            "message": "NFT minting submitted; rewards are distributed once the transaction confirms",
             "analysis_id": request.analysis_id,
             "quality_score": analysis.quality_score.overall_score,
             "contributor_address": request.contributor_address,
+            "mint_status": minting_result.get("status") or "failed",
+            "status_url": f"/api/mint/{tx_hash}" if tx_hash else f"/api/analysis/{request.analysis_id}",
             "rewards": {
-                "analysis_reward": analysis_reward,
-                "mint_reward": mint_reward,
-                "quality_bonus": quality_bonus,
-                "total_tokens_earned": total_tokens,
+                "analysis_reward": 0,
+                "mint_reward": 0,
+                "quality_bonus": 0,
+                "total_tokens_earned": 0,
                 "reward_transactions": {
-                    "analysis_tx": rewards_info.get("analysis_reward", {}).get("transaction_hash"),
-                    "mint_tx": rewards_info.get("mint_reward", {}).get("transaction_hash")
+                    "analysis_tx": None,
+                    "mint_tx": None
                 }
             },
             "nft_details": {
                 "contract_address": "0x2181B366B730628F97c44C17de19949e5359682C",
-                "token_id": str(minting_result.get("token_id", "")),
-                "transaction_hash": minting_result.get("transaction_hash", ""),
+                "token_id": "",
+                "transaction_hash": tx_hash or "",
                 "ipfs_hash": minting_result.get("ipfs_uri", "").replace("ipfs://", ""),
                 "metadata_url": minting_result.get("ipfs_uri", ""),
-                "gas_used": minting_result.get("gas_used")
+                "gas_used": None
             },
             "minter_address": request.contributor_address,
             "timestamp": datetime.now(timezone.utc).isoformat(),
-            "platform": "BNB Smart Chain Testnet"
+            "platform": "BNB Smart Chain Testnet",
+            "error": minting_result.get("error")
         }
     except ImportError as e:
         # Fallback response if blockchain module can't be imported
@@ -349,6 +547,12 @@ async def process_nft_minting(analysis: AnalysisResult, contributor_address: str
 
 class ClaimRewardsRequest(BaseModel):
     wallet_address: str = Field(..., description="Wallet address to claim rewards for")
+    
+    @field_validator('wallet_address')
+    @classmethod
+    def validate_wallet_address(cls, v):
+        # Shape check only; _distribute_tokens checksums it inside the endpoint's try block
+        return _validate_address(v)
 
 @app.post("/api/claim-rewards")
 async def claim_pending_rewards(request: ClaimRewardsRequest):
@@ -359,7 +563,7 @@ async def claim_pending_rewards(request: ClaimRewardsRequest):
         logger.info(f"Processing reward claim for {request.wallet_address}")
         
         # Import blockchain integration
-        from blockchain import BlockchainIntegration, RewardSystem
+        from blockchain import get_blockchain_instance, RewardSystem
         
         # Initialize blockchain client with private key from environment
         private_key = os.getenv("PRIVATE_KEY")
@@ -370,7 +574,7 @@ async def claim_pending_rewards(request: ClaimRewardsRequest):
                 "total_claimed": 0
             }
         
-        blockchain_client = BlockchainIntegration(private_key)
+        blockchain_client = get_blockchain_instance()
         reward_system = RewardSystem(blockchain_client)
         
         # Check for pending rewards (this would typically check a database)
@@ -388,11 +592,12 @@ async def claim_pending_rewards(request: ClaimRewardsRequest):
         
         # Distribute the pending rewards
         if pending_validation_rewards > 0:
-            result = await reward_system._distribute_tokens(
-                request.wallet_address, 
-                pending_validation_rewards, 
-                "manual_claim"
-            )
+            async with RPC_SEM:
+                result = await reward_system._distribute_tokens(
+                    request.wallet_address, 
+                    pending_validation_rewards, 
+                    "manual_claim"
+                )
             
             if result.get("success"):
                 logger.info(f"Successfully claimed {total_pending} GENOME tokens for {request.wallet_address}")
@@ -430,5 +635,21 @@ async def claim_pending_rewards(request: ClaimRewardsRequest):
         raise HTTPException(status_code=500, detail=f"Error claiming rewards: {str(e)}")
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    from start_api import write_pid_file
+    
+    write_pid_file()
+    
+    # Analyses and mint status live in Redis, so workers share no in-process state.
+    # The nonce counter and mint/receipt queues are per process, though: with a signing
+    # key configured, default to one worker so concurrent sends can't race on nonces.
+    default_workers = "1" if os.getenv("PRIVATE_KEY") else str(os.cpu_count() or 1)
+    uvicorn.run(
+        "api_server:app",
+        host="0.0.0.0",
+        port=8001,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop has no Windows support
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", default_workers))
+    )
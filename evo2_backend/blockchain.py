@@ -3,16 +3,22 @@ Blockchain Integration Module
 Connects the AI API with deployed BNB Chain smart contracts
 """
 import os
-import json
 import logging
 import asyncio
-from typing import Dict, Any, Optional, Tuple
+import bisect
+import functools
+import hashlib
+import time
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime
 
-from web3 import Web3
+from eth_account import Account
+from web3 import AsyncWeb3, AsyncHTTPProvider, Web3, WebSocketProvider
+from web3.exceptions import TransactionNotFound
 from web3.middleware import ExtraDataToPOAMiddleware
 import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -21,13 +27,20 @@ CONTRACT_ADDRESSES = {
     "genomeToken": "0x0C5f98e281cB3562a2EEDF3EE63D3b623De98b15",
     "genomeNFT": "0x2181B366B730628F97c44C17de19949e5359682C",
     "genomeMarketplace": "0xd80bE0DDCA595fFf35bF44A7d2D4E312b05A1576",
-    "genomeDAO": "0x8FEbF8eA03E8e54846a7B82f7F6146bAE17bd3f4"
+    "genomeDAO": "0x8FEbF8eA03E8e54846a7B82f7F6146bAE17bd3f4",
+    # Canonical Multicall3 deployment (same address on every EVM chain)
+    "multicall3": "0xcA11bde05977b3631167028862bE2a173976CA11"
 }
+# Checksum once here so web3 never has to re-normalize them per call
+CONTRACT_ADDRESSES = {name: Web3.to_checksum_address(addr) for name, addr in CONTRACT_ADDRESSES.items()}
 
 # BNB Testnet configuration
 BNB_TESTNET_RPC = "https://data-seed-prebsc-1-s1.binance.org:8545"
 CHAIN_ID = 97
 
+# WebSocket endpoint for newHeads; set BNB_TESTNET_WS="" to always poll for receipts
+BNB_TESTNET_WS = os.getenv("BNB_TESTNET_WS", "wss://bsc-testnet.publicnode.com")
+
 # Reward amounts (in tokens with 18 decimals)
 REWARD_AMOUNTS = {
     "analysis": 10,      # 10 GENOME tokens for sequence analysis
@@ -37,115 +50,344 @@ REWARD_AMOUNTS = {
     "quality_bonus": 20,  # 20 GENOME tokens for high-quality analysis
 }
 
+# Contract ABIs live in abis/ (minimal ABIs for the functions we call); a Hardhat
+# artifact from contracts/artifacts/ can be dropped in as-is
+ABI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "abis")
+
+_CONTRACT_ABI_FILES = {
+    "genomeNFT": "GenomeNFT.json",
+    "genomeToken": "GenomeToken.json",
+    # Multicall3 aggregate3: batch many view calls into one eth_call
+    "multicall3": "Multicall3.json",
+}
+
+@functools.lru_cache(maxsize=8)
+def _load_abi(filename: str) -> tuple:
+    """Read and parse an ABI file once per process"""
+    with open(os.path.join(ABI_DIR, filename), "rb") as f:
+        data = orjson.loads(f.read())
+    # Accept both bare ABI arrays and Hardhat artifacts ({"abi": [...], ...})
+    return tuple(data["abi"] if isinstance(data, dict) else data)
+
+# balanceOf(address) selector, for hand-encoding multicall payloads
+BALANCE_OF_SELECTOR = bytes.fromhex("70a08231")
+
+# transfer(address,uint256) selector, for hand-encoding reward transfers
+TRANSFER_SELECTOR = bytes.fromhex("a9059cbb")
+
+# Transfer(address,address,uint256) event topic, for scanning mint receipts without ABI decoding
+TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)")
+_GENOME_NFT_ADDRESS_LOWER = CONTRACT_ADDRESSES["genomeNFT"].lower()
+
+# Balances change rarely; serve repeat lookups from memory for a few seconds
+BALANCE_CACHE_TTL_SECONDS = 10.0
+
+@functools.lru_cache(maxsize=1024)
+def _metadata_template(gene_name: Optional[str], quality_score: float) -> Tuple[str, str, str]:
+    """Per-(gene, score) metadata strings: (name, default description, gene attribute value)
+
+    Scores arrive rounded to two places, so repeat mints of the same gene hit the cache.
+    """
+    return (
+        f"Genomic Discovery: {gene_name or 'Unknown Gene'}",
+        f"High-quality genomic analysis (Score: {quality_score}/100)",
+        gene_name or "Unknown",
+    )
+
+# How often the background gas oracle re-reads eth_gasPrice
+GAS_PRICE_REFRESH_SECONDS = 3.0
+
+# Node errors meaning our local nonce fell behind the chain (e.g. another sender used the key,
+# or a pending tx already holds this nonce)
+NONCE_RESYNC_ERRORS = ("nonce too low", "already known", "replacement transaction underpriced")
+
+# Cached gas prices older than this are refetched on read (covers clients without the refresh loop)
+GAS_PRICE_MAX_AGE_SECONDS = 5.0
+
+class NonceManager:
+    """Hands out sequential nonces for one account without racing concurrent senders"""
+    
+    def __init__(self, w3: AsyncWeb3, address: str):
+        self.w3 = w3
+        self.address = address
+        self._lock = asyncio.Lock()
+        self._nonce: Optional[int] = None
+    
+    async def next(self, fetch_pending_count: Optional[Callable[[], Awaitable[int]]] = None) -> int:
+        """Reserve the next nonce (seeded from the chain once, then counted locally)
+
+        ``fetch_pending_count`` replaces the default pending-count lookup for seeding;
+        it runs under the lock, so concurrent cold starts seed only once.
+        """
+        async with self._lock:
+            if self._nonce is None:
+                if fetch_pending_count is not None:
+                    self._nonce = await fetch_pending_count()
+                else:
+                    self._nonce = await self.w3.eth.get_transaction_count(self.address, 'pending')
+            nonce = self._nonce
+            self._nonce += 1
+            return nonce
+    
+    def seed(self, pending_count: int):
+        """Seed the counter from an externally fetched pending count (no-op once seeded)"""
+        if self._nonce is None:
+            self._nonce = pending_count
+    
+    def reset(self):
+        """Drop the local counter so the next reservation resyncs from the network"""
+        self._nonce = None
+
+class GasOracle:
+    """Gas price cache refreshed in the background instead of queried per transaction"""
+    
+    def __init__(
+        self,
+        w3: AsyncWeb3,
+        refresh_interval: float = GAS_PRICE_REFRESH_SECONDS,
+        max_age: float = GAS_PRICE_MAX_AGE_SECONDS
+    ):
+        self.w3 = w3
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self._gas_price: Optional[int] = None
+        self._fetched_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def cached(self) -> Optional[int]:
+        """Cached gas price, or None if missing or stale"""
+        if time.monotonic() - self._fetched_at < self.max_age:
+            return self._gas_price
+        return None
+    
+    def update(self, gas_price: int):
+        self._gas_price = gas_price
+        self._fetched_at = time.monotonic()
+    
+    async def gas_price(self) -> int:
+        """Latest gas price, refetched when the cached value has gone stale"""
+        cached = self.cached
+        if cached is None:
+            cached = await self.w3.eth.gas_price
+            self.update(cached)
+        return cached
+    
+    def start(self):
+        """Start the refresh loop (call from a running event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self):
+        """Cancel the refresh loop"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _refresh_loop(self):
+        while True:
+            try:
+                self.update(await self.w3.eth.gas_price)
+            except Exception as e:
+                logger.warning(f"Gas price refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+# Longest a receipt check waits for a block notification before polling anyway
+BLOCK_WAIT_FALLBACK_SECONDS = 6.0
+
+class BlockWatcher:
+    """newHeads subscription that wakes receipt waiters once per block"""
+    
+    def __init__(self, ws_url: str, reconnect_delay: float = 5.0):
+        self.ws_url = ws_url
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self._block_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def next_block_event(self) -> asyncio.Event:
+        """Event set when the next block header arrives (grab before checking state)"""
+        return self._block_event
+    
+    def start(self):
+        """Start the subscription loop (call from a running event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Cancel the subscription loop"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.connected = False
+    
+    async def _run(self):
+        while True:
+            try:
+                async with AsyncWeb3(WebSocketProvider(self.ws_url)) as ws_w3:
+                    await ws_w3.eth.subscribe("newHeads")
+                    self.connected = True
+                    logger.info(f"Subscribed to newHeads on {self.ws_url}")
+                    async for _ in ws_w3.socket.process_subscriptions():
+                        event, self._block_event = self._block_event, asyncio.Event()
+                        event.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"newHeads subscription lost ({e}); receipts fall back to polling")
+            self.connected = False
+            await asyncio.sleep(self.reconnect_delay)
+
+@functools.lru_cache(maxsize=None)
+def _get_web3(rpc_url: str) -> AsyncWeb3:
+    """One AsyncWeb3 per RPC URL, so clients share the provider and cached contracts"""
+    # Async provider so RPC round-trips don't block the FastAPI event loop
+    w3 = AsyncWeb3(AsyncHTTPProvider(rpc_url))
+    
+    # Add PoA middleware for BNB Chain (works for both sync and async providers)
+    w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+    return w3
+
 class BlockchainIntegration:
     def __init__(self, private_key: str = None):
         """Initialize blockchain connection"""
-        self.w3 = Web3(Web3.HTTPProvider(BNB_TESTNET_RPC))
-        
-        # Add PoA middleware for BNB Chain
-        self.w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+        self.w3 = _get_web3(BNB_TESTNET_RPC)
         
         if private_key:
-            self.account = self.w3.eth.account.from_key(private_key)
+            self.account = Account.from_key(private_key)
+            # Bound signer: eth-keys uses libsecp256k1 (coincurve) when it is installed
+            self._sign = self.account.sign_transaction
+            self.address_checksum = Web3.to_checksum_address(self.account.address)
             # Track nonce to prevent conflicts
-            self._nonce = None
+            self.nonces = NonceManager(self.w3, self.address_checksum)
         else:
             self.account = None
-            self._nonce = None
+            self.address_checksum = None
+            self.nonces = None
+        
+        self.gas_oracle = GasOracle(self.w3)
+        self.block_watcher = BlockWatcher(BNB_TESTNET_WS) if BNB_TESTNET_WS else None
             
         # Load contract ABIs (you'll need to add these)
         self.contracts = self._load_contracts()
         
-        logger.info(f"Connected to BNB Chain, latest block: {self.w3.eth.block_number}")
+        # address -> (balance, monotonic expiry)
+        self._balance_cache: Dict[str, Tuple[int, float]] = {}
+        
+        # Pooled client for raw JSON-RPC batches, created on first use
+        self._rpc_client: Optional[httpx.AsyncClient] = None
+        
+        logger.info(f"Initialized BNB Chain client for {BNB_TESTNET_RPC}")
     
-    def get_next_nonce(self):
-        """Get the next nonce for transactions, always fresh from network"""
+    def start_background_tasks(self):
+        """Start the gas oracle and block watcher (call from a running event loop)"""
+        self.gas_oracle.start()
+        if self.block_watcher is not None:
+            self.block_watcher.start()
+    
+    async def aclose(self):
+        """Stop background tasks and close the provider's pooled HTTP sessions"""
+        await self.gas_oracle.stop()
+        if self.block_watcher is not None:
+            await self.block_watcher.stop()
+        if self._rpc_client is not None:
+            await self._rpc_client.aclose()
+            self._rpc_client = None
+        await self.w3.provider.disconnect()
+    
+    async def get_block_number(self) -> int:
+        """Get the latest block number (also serves as a connectivity check)"""
+        return await self.w3.eth.block_number
+    
+    async def get_next_nonce(self):
+        """Reserve the next nonce for a transaction"""
         if not self.account:
             return 0
-            
-        # Always get fresh nonce from network to prevent conflicts
-        current_nonce = self.w3.eth.get_transaction_count(self.account.address, 'pending')
-        return current_nonce
+        return await self.nonces.next()
     
-    def _load_contracts(self) -> Dict[str, Any]:
-        """Load contract instances with ABIs"""
-        contracts = {}
-        
-        # You would load these from your artifacts/contracts/ directory
-        # For now, we'll create minimal ABIs for the key functions we need
-        
-        # GenomeNFT minimal ABI for minting
-        genome_nft_abi = [
-            {
-                "inputs": [
-                    {"name": "to", "type": "address"},
-                    {"name": "tokenURI_", "type": "string"},
-                    {"name": "geneName", "type": "string"},
-                    {"name": "description", "type": "string"},
-                    {"name": "ipfsHash", "type": "string"},
-                    {"name": "qualityScore", "type": "uint256"}
-                ],
-                "name": "mint",
-                "outputs": [{"name": "", "type": "uint256"}],
-                "stateMutability": "nonpayable",
-                "type": "function"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {"indexed": True, "name": "from", "type": "address"},
-                    {"indexed": True, "name": "to", "type": "address"},
-                    {"indexed": True, "name": "tokenId", "type": "uint256"}
-                ],
-                "name": "Transfer",
-                "type": "event"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {"indexed": True, "name": "to", "type": "address"},
-                    {"indexed": True, "name": "tokenId", "type": "uint256"},
-                    {"indexed": False, "name": "ipfsHash", "type": "string"},
-                    {"indexed": False, "name": "qualityScore", "type": "uint256"},
-                    {"indexed": False, "name": "contributor", "type": "address"}
-                ],
-                "name": "NFTMinted",
-                "type": "event"
-            }
-        ]
+    async def get_tx_params(self) -> Tuple[int, int]:
+        """Return (gas price, reserved nonce) for the next transaction"""
+        # Cold start: fetch both in one JSON-RPC batch instead of two round trips
+        # (chainId is the constant CHAIN_ID, so it never needs fetching)
+        if self.gas_oracle.cached is None:
+            nonce = await self.nonces.next(self._seed_gas_price_and_nonce)
+        else:
+            nonce = await self.get_next_nonce()
         
-        # GenomeToken minimal ABI
-        genome_token_abi = [
-            {
-                "inputs": [{"name": "account", "type": "address"}],
-                "name": "balanceOf",
-                "outputs": [{"name": "", "type": "uint256"}],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "inputs": [
-                    {"name": "to", "type": "address"},
-                    {"name": "amount", "type": "uint256"}
-                ],
-                "name": "transfer",
-                "outputs": [{"name": "", "type": "bool"}],
-                "stateMutability": "nonpayable",
-                "type": "function"
-            }
+        return await self.gas_oracle.gas_price(), nonce
+    
+    async def _seed_gas_price_and_nonce(self) -> int:
+        """Fetch gas price and pending nonce in one JSON-RPC batch; caches the gas price"""
+        # Raw POST rather than w3.batch_requests(): web3's batch mode is provider-wide,
+        # so concurrent calls on the shared AsyncWeb3 would be swallowed into the batch
+        if self._rpc_client is None:
+            self._rpc_client = httpx.AsyncClient(timeout=10.0)
+        payload = [
+            {"jsonrpc": "2.0", "id": 1, "method": "eth_gasPrice", "params": []},
+            {"jsonrpc": "2.0", "id": 2, "method": "eth_getTransactionCount", "params": [self.address_checksum, "pending"]},
         ]
-        
-        contracts["genomeNFT"] = self.w3.eth.contract(
-            address=CONTRACT_ADDRESSES["genomeNFT"],
-            abi=genome_nft_abi
+        response = await self._rpc_client.post(
+            BNB_TESTNET_RPC, content=orjson.dumps(payload), headers={"Content-Type": "application/json"}
         )
+        response.raise_for_status()
         
-        contracts["genomeToken"] = self.w3.eth.contract(
-            address=CONTRACT_ADDRESSES["genomeToken"],
-            abi=genome_token_abi
-        )
+        # Batch responses may come back in any order; match them up by id
+        results = {}
+        for item in orjson.loads(response.content):
+            if "error" in item:
+                raise ValueError(f"JSON-RPC error: {item['error']}")
+            results[item["id"]] = int(item["result"], 16)
+        
+        self.gas_oracle.update(results[1])
+        return results[2]
+    
+    def reset_nonce(self):
+        """Drop the local nonce so the next transaction resyncs from the network"""
+        if self.nonces is not None:
+            self.nonces.reset()
+    
+    async def sign_transaction(self, transaction: Dict[str, Any]):
+        """Sign off the event loop; ECDSA signing is CPU-bound and releases the GIL"""
+        return await asyncio.to_thread(self._sign, transaction)
+    
+    async def _sign_and_send(self, transaction: Dict[str, Any]):
+        signed_txn = await self.sign_transaction(transaction)
+        
+        # Handle different web3.py versions
+        try:
+            raw_transaction = signed_txn.raw_transaction
+        except AttributeError:
+            raw_transaction = signed_txn.rawTransaction
         
-        return contracts
+        return await self.w3.eth.send_raw_transaction(raw_transaction)
+    
+    async def send_transaction(self, transaction: Dict[str, Any]):
+        """Sign and send, resyncing the nonce and retrying once if the node says it is stale"""
+        try:
+            return await self._sign_and_send(transaction)
+        except Exception as e:
+            if not any(msg in str(e).lower() for msg in NONCE_RESYNC_ERRORS):
+                raise
+            logger.warning(f"Nonce {transaction['nonce']} rejected ({e}), resyncing from the node")
+            self.reset_nonce()
+            transaction = {**transaction, 'nonce': await self.get_next_nonce()}
+            return await self._sign_and_send(transaction)
+    
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _build_contract(cls, w3: AsyncWeb3, address: str, abi_id: str):
+        """Build a contract object once per (web3 instance, address, ABI)"""
+        return w3.eth.contract(address=address, abi=_load_abi(_CONTRACT_ABI_FILES[abi_id]))
+    
+    def _load_contracts(self) -> Dict[str, Any]:
+        """Load contract instances with ABIs"""
+        return {
+            "genomeNFT": self._build_contract(self.w3, CONTRACT_ADDRESSES["genomeNFT"], "genomeNFT"),
+            "genomeToken": self._build_contract(self.w3, CONTRACT_ADDRESSES["genomeToken"], "genomeToken"),
+            "multicall3": self._build_contract(self.w3, CONTRACT_ADDRESSES["multicall3"], "multicall3"),
+        }
     
     async def mint_genomic_nft(
         self,
@@ -171,7 +413,8 @@ class BlockchainIntegration:
             nft_contract = self.contracts["genomeNFT"]
             
             # Build transaction
-            transaction = nft_contract.functions.mint(
+            gas_price, nonce = await self.get_tx_params()
+            transaction = await nft_contract.functions.mint(
                 contributor_address,
                 token_uri,
                 gene_name,
@@ -179,31 +422,69 @@ class BlockchainIntegration:
                 ipfs_hash,
                 quality_score
             ).build_transaction({
-                'from': self.account.address,
+                'from': self.address_checksum,
                 'gas': 300000,
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': self.get_next_nonce(),
+                'gasPrice': gas_price,
+                'nonce': nonce,
                 'chainId': CHAIN_ID
             })
             
-            # Sign transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            
-            # Send transaction (handle different web3.py versions)
-            try:
-                raw_transaction = signed_txn.raw_transaction
-            except AttributeError:
-                raw_transaction = signed_txn.rawTransaction
-            
-            tx_hash = self.w3.eth.send_raw_transaction(raw_transaction)
+            # Sign and send transaction
+            tx_hash = await self.send_transaction(transaction)
             
             logger.info(f"NFT minting transaction sent: {tx_hash.hex()}")
             logger.info(f"Chain ID: {CHAIN_ID}")
             logger.info(f"RPC URL: {BNB_TESTNET_RPC}")
             logger.info(f"Transaction hash length: {len(tx_hash.hex())}")
             
-            # Wait for confirmation (optional - can be done in background)
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            # Confirmation is awaited separately (see wait_for_mint_receipt)
+            return {
+                "success": True,
+                "transaction_hash": tx_hash.hex(),
+                "status": "pending"
+            }
+                
+        except Exception as e:
+            # The reserved nonce was never used; resync before the next transaction
+            self.reset_nonce()
+            logger.error(f"NFT minting failed: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def _wait_for_receipt_on_new_blocks(self, tx_hash: str, timeout: float):
+        """Check for the receipt once per new block instead of polling on a timer"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            block_seen = self.block_watcher.next_block_event()
+            try:
+                return await self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                pass
+            
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise TimeoutError(f"Transaction {tx_hash} not mined after {timeout}s")
+            try:
+                await asyncio.wait_for(block_seen.wait(), min(remaining, BLOCK_WAIT_FALLBACK_SECONDS))
+            except asyncio.TimeoutError:
+                pass  # No header in time (missed or slow); check again anyway
+    
+    async def wait_for_receipt(self, tx_hash: str, timeout: float = 120, poll_latency: float = 1.0):
+        """Wait for a transaction to be mined (on new blocks if subscribed, else by polling)"""
+        if self.block_watcher is not None and self.block_watcher.connected:
+            return await self._wait_for_receipt_on_new_blocks(tx_hash, timeout)
+        return await self.w3.eth.wait_for_transaction_receipt(
+            tx_hash, timeout=timeout, poll_latency=poll_latency
+        )
+    
+    async def wait_for_mint_receipt(self, tx_hash: str, timeout: float = 120, poll_latency: float = 1.0) -> Dict[str, Any]:
+        """Wait for a mint transaction to be mined and extract the minted token ID"""
+        try:
+            # HexBytes.hex() may omit the 0x prefix depending on the hexbytes version
+            tx_hash = tx_hash if tx_hash.startswith("0x") else f"0x{tx_hash}"
+            receipt = await self.wait_for_receipt(tx_hash, timeout, poll_latency)
             
             if receipt.status == 1:
                 logger.info(f"NFT minted successfully! Gas used: {receipt.gasUsed}")
@@ -211,12 +492,17 @@ class BlockchainIntegration:
                 # Extract token ID from Transfer event logs
                 token_id = None
                 try:
-                    # Parse the Transfer event to get token ID
-                    nft_contract = self.contracts["genomeNFT"]
-                    transfer_events = nft_contract.events.Transfer().process_receipt(receipt)
-                    if transfer_events:
-                        token_id = transfer_events[0]['args']['tokenId']
-                        logger.info(f"Token ID minted: {token_id}")
+                    # ERC-721 Transfer indexes tokenId, so it is the 4th topic; no ABI decoding needed
+                    for log in receipt.logs:
+                        topics = log["topics"]
+                        if (
+                            len(topics) == 4
+                            and topics[0] == TRANSFER_TOPIC
+                            and log["address"].lower() == _GENOME_NFT_ADDRESS_LOWER
+                        ):
+                            token_id = int.from_bytes(topics[3], "big")
+                            logger.info(f"Token ID minted: {token_id}")
+                            break
                 except Exception as e:
                     logger.warning(f"Could not extract token ID: {e}")
                     # Fallback: use a placeholder or transaction-based ID
@@ -224,7 +510,8 @@ class BlockchainIntegration:
                 
                 return {
                     "success": True,
-                    "transaction_hash": tx_hash.hex(),
+                    "status": "confirmed",
+                    "transaction_hash": tx_hash,
                     "token_id": token_id,
                     "gas_used": receipt.gasUsed,
                     "block_number": receipt.blockNumber
@@ -233,39 +520,72 @@ class BlockchainIntegration:
                 raise Exception("Transaction failed")
                 
         except Exception as e:
-            logger.error(f"NFT minting failed: {e}")
+            logger.error(f"NFT mint confirmation failed for {tx_hash}: {e}")
             return {
                 "success": False,
+                "status": "failed",
+                "transaction_hash": tx_hash,
                 "error": str(e)
             }
     
     async def get_token_balance(self, address: str) -> int:
         """Get GENOME token balance for an address"""
+        # Cache under the checksummed form so differently-cased callers share one entry
+        address = Web3.to_checksum_address(address)
+        cached = self._balance_cache.get(address)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        
         try:
-            balance = self.contracts["genomeToken"].functions.balanceOf(address).call()
+            balance = await self.contracts["genomeToken"].functions.balanceOf(address).call()
+            self._balance_cache[address] = (balance, time.monotonic() + BALANCE_CACHE_TTL_SECONDS)
             return balance
         except Exception as e:
             logger.error(f"Failed to get token balance: {e}")
             return 0
     
-    async def upload_to_ipfs(self, metadata: Dict[str, Any]) -> str:
-        """Upload metadata to IPFS (mock implementation)"""
-        # In production, you would use a service like Pinata, Infura, or run your own IPFS node
+    async def get_token_balances(self, addresses: List[str]) -> List[int]:
+        """Get GENOME token balances for many addresses in a single eth_call (multicall3)"""
+        if len(addresses) <= 1:
+            return [await self.get_token_balance(a) for a in addresses]
+        
+        # Checksumming rejects malformed addresses and normalizes the cache keys
+        addresses = [Web3.to_checksum_address(a) for a in addresses]
+        token_address = CONTRACT_ADDRESSES["genomeToken"]
+        calls = [
+            # selector + address left-padded to 32 bytes
+            (token_address, True, BALANCE_OF_SELECTOR + bytes(12) + bytes.fromhex(a[2:]))
+            for a in addresses
+        ]
         
         try:
-            # Mock IPFS upload - replace with actual IPFS service
-            metadata_json = json.dumps(metadata, indent=2)
-            
-            # For demo, we'll just return a mock hash
-            # In production: upload to IPFS and return real hash
-            mock_hash = f"Qm{hash(metadata_json) % 1000000000000000000:018x}"
-            
-            logger.info(f"Metadata uploaded to IPFS: {mock_hash}")
-            return f"ipfs://{mock_hash}"
-            
+            results = await self.contracts["multicall3"].functions.aggregate3(calls).call()
         except Exception as e:
-            logger.error(f"IPFS upload failed: {e}")
-            raise
+            logger.error(f"Failed to get token balances: {e}")
+            return [0] * len(addresses)
+        
+        balances = [
+            int.from_bytes(data[:32], "big") if success and len(data) >= 32 else 0
+            for success, data in results
+        ]
+        expiry = time.monotonic() + BALANCE_CACHE_TTL_SECONDS
+        for address, balance in zip(addresses, balances):
+            self._balance_cache[address] = (balance, expiry)
+        return balances
+    
+    async def invalidate_balance_when_mined(self, address: str, tx_hash: str, timeout: float = 120):
+        """Drop the cached balance once a transfer to ``address`` is mined
+
+        Evicting at send time would let a read before the block lands re-cache
+        the old balance for a full TTL.
+        """
+        tx_hash = tx_hash if tx_hash.startswith("0x") else f"0x{tx_hash}"
+        try:
+            await self.wait_for_receipt(tx_hash, timeout)
+        except Exception as e:
+            logger.warning(f"Transfer {tx_hash} not confirmed ({e}); cached balance expires on its TTL")
+            return
+        self._balance_cache.pop(Web3.to_checksum_address(address), None)
     
     def create_nft_metadata(
         self,
@@ -277,10 +597,11 @@ class BlockchainIntegration:
         analysis_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Create NFT metadata following OpenSea standards"""
+        name, default_description, gene_value = _metadata_template(gene_name, quality_score)
         
         return {
-            "name": f"Genomic Discovery: {gene_name or 'Unknown Gene'}",
-            "description": description or f"High-quality genomic analysis (Score: {quality_score}/100)",
+            "name": name,
+            "description": description or default_description,
             "image": "ipfs://QmGenomeNFTImage",  # You would upload an image representing the discovery
             "attributes": [
                 {
@@ -290,7 +611,7 @@ class BlockchainIntegration:
                 },
                 {
                     "trait_type": "Gene Name",
-                    "value": gene_name or "Unknown"
+                    "value": gene_value
                 },
                 {
                     "trait_type": "Analysis ID",
@@ -328,54 +649,12 @@ def get_blockchain_instance() -> BlockchainIntegration:
         blockchain = BlockchainIntegration(private_key)
     return blockchain
 
-async def process_nft_minting_with_blockchain(
-    analysis_result: Dict[str, Any],
-    contributor_address: str
-) -> Dict[str, Any]:
-    """Complete NFT minting process with blockchain integration"""
-    
-    try:
-        blockchain_client = get_blockchain_instance()
-        
-        # Create metadata
-        metadata = blockchain_client.create_nft_metadata(
-            analysis_id=analysis_result["analysis_id"],
-            gene_name=analysis_result["analysis_metadata"].get("gene_name"),
-            description=analysis_result["analysis_metadata"].get("description"),
-            quality_score=analysis_result["quality_score"]["overall_score"],
-            contributor_address=contributor_address,
-            analysis_data=analysis_result["analysis_metadata"]
-        )
-        
-        # Upload to IPFS
-        ipfs_uri = await blockchain_client.upload_to_ipfs(metadata)
-        
-        # Mint NFT on blockchain
-        mint_result = await blockchain_client.mint_genomic_nft(
-            contributor_address=contributor_address,
-            token_uri=ipfs_uri,
-            gene_name=analysis_result["analysis_metadata"].get("gene_name") or "Unknown Gene",
-            description=analysis_result["analysis_metadata"].get("description") or "AI-analyzed genomic sequence",
-            ipfs_hash=ipfs_uri.replace("ipfs://", ""),
-            quality_score=int(analysis_result["quality_score"]["overall_score"])
-        )
-        
-        return {
-            "minting_successful": mint_result["success"],
-            "transaction_hash": mint_result.get("transaction_hash"),
-            "token_id": mint_result.get("token_id"),
-            "gas_used": mint_result.get("gas_used"),
-            "ipfs_uri": ipfs_uri,
-            "metadata": metadata
-        }
-        
-    except Exception as e:
-        logger.error(f"Blockchain NFT minting failed: {e}")
-        return {
-            "minting_successful": False,
-            "error": str(e)
-        }
-
+async def close_blockchain_instance():
+    """Release the shared instance's background task and RPC sessions (FastAPI shutdown)"""
+    global blockchain
+    if blockchain is not None:
+        await blockchain.aclose()
+        blockchain = None
 
 # Automated Reward System Functions
 class RewardSystem:
@@ -466,33 +745,32 @@ class RewardSystem:
             raise ValueError("No private key configured for reward distribution")
         
         try:
+            # Raises ValueError on anything that isn't a 20-byte address
+            recipient = Web3.to_checksum_address(recipient_address)
+            
             # Convert to wei (18 decimals)
             amount_wei = int(amount * 10**18)
             
-            # Get token contract
-            token_contract = self.blockchain.contracts["genomeToken"]
-            
-            # Build transaction
-            transaction = token_contract.functions.transfer(
-                recipient_address,
-                amount_wei
-            ).build_transaction({
-                'from': self.blockchain.account.address,
+            # Build transaction: both args are static, so encode the calldata directly
+            # instead of going through the contract's ABI codec
+            gas_price, nonce = await self.blockchain.get_tx_params()
+            transaction = {
+                'from': self.blockchain.address_checksum,
+                'to': CONTRACT_ADDRESSES["genomeToken"],
+                'value': 0,
+                'data': (
+                    TRANSFER_SELECTOR
+                    + bytes.fromhex(recipient[2:]).rjust(32, b"\x00")
+                    + amount_wei.to_bytes(32, "big")
+                ),
                 'gas': 100000,
-                'gasPrice': self.blockchain.w3.eth.gas_price,
-                'nonce': self.blockchain.get_next_nonce(),
+                'gasPrice': gas_price,
+                'nonce': nonce,
                 'chainId': CHAIN_ID
-            })
+            }
             
             # Sign and send transaction
-            signed_txn = self.blockchain.w3.eth.account.sign_transaction(transaction, self.blockchain.account.key)
-            
-            try:
-                raw_transaction = signed_txn.raw_transaction
-            except AttributeError:
-                raw_transaction = signed_txn.rawTransaction
-            
-            tx_hash = self.blockchain.w3.eth.send_raw_transaction(raw_transaction)
+            tx_hash = await self.blockchain.send_transaction(transaction)
             
             logger.info(f"Token reward transaction sent: {tx_hash.hex()}")
             
@@ -505,62 +783,58 @@ class RewardSystem:
             }
             
         except Exception as e:
+            # The reserved nonce was never used; resync before the next transaction
+            self.blockchain.reset_nonce()
             logger.error(f"Error in token distribution: {str(e)}")
             raise
 
 
-# Enhanced NFT minting process with automatic rewards
-async def process_nft_minting_with_rewards(
+# Rewards owed to a contributor once their NFT mint is confirmed
+async def distribute_minting_rewards(
     analysis_result: Dict[str, Any],
     contributor_address: str,
     blockchain_client: BlockchainIntegration
 ) -> Dict[str, Any]:
-    """Process NFT minting with automatic reward distribution"""
-    try:
-        # Initialize reward system
-        reward_system = RewardSystem(blockchain_client)
-        
-        # First, mint the NFT (existing process)
-        mint_result = await process_nft_minting_with_blockchain(
-            analysis_result, contributor_address
+    """Distribute the analysis and NFT minting rewards for a confirmed mint"""
+    reward_system = RewardSystem(blockchain_client)
+    contributor_address = Web3.to_checksum_address(contributor_address)
+    
+    # Both transfers are independent; NonceManager hands each a distinct nonce
+    analysis_reward, mint_reward = await asyncio.gather(
+        reward_system.distribute_analysis_reward(
+            contributor_address, 
+            analysis_result["quality_score"]["overall_score"]
+        ),
+        reward_system.distribute_nft_mint_reward(contributor_address)
+    )
+    
+    return {
+        "analysis_reward": analysis_reward,
+        "mint_reward": mint_reward,
+        "total_tokens_earned": (
+            analysis_reward.get("reward_amount", 0) + 
+            mint_reward.get("reward_amount", 0)
         )
-        
-        if mint_result["minting_successful"]:
-            # Distribute analysis reward
-            analysis_reward = await reward_system.distribute_analysis_reward(
-                contributor_address, 
-                analysis_result["quality_score"]["overall_score"]
-            )
-            
-            # Small delay to prevent nonce conflicts
-            await asyncio.sleep(1)
-            
-            # Distribute NFT minting reward
-            mint_reward = await reward_system.distribute_nft_mint_reward(contributor_address)
-            
-            # Add reward information to result
-            mint_result["rewards"] = {
-                "analysis_reward": analysis_reward,
-                "mint_reward": mint_reward,
-                "total_tokens_earned": (
-                    analysis_reward.get("reward_amount", 0) + 
-                    mint_reward.get("reward_amount", 0)
-                )
-            }
-        
-        return mint_result
-        
-    except Exception as e:
-        logger.error(f"Error in enhanced NFT minting process: {str(e)}")
-        raise
+    }
 
 
 # IPFS Integration for Metadata Storage
 class IPFSIntegration:
     """IPFS integration for storing NFT metadata"""
     
-    def __init__(self, ipfs_gateway: str = "https://ipfs.io/ipfs/"):
+    def __init__(
+        self,
+        ipfs_gateway: str = "https://ipfs.io/ipfs/",
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
         self.gateway = ipfs_gateway
+        # Keep-alive client reused across uploads: the caller's (e.g. the API's app-wide pool) or our own
+        self._owns_client = http_client is None
+        self._client = http_client or httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+            timeout=30.0
+        )
         # For production, you'd use a service like Pinata, Infura IPFS, or local IPFS node
         self.pinata_api_key = os.getenv("PINATA_API_KEY")
         self.pinata_secret = os.getenv("PINATA_SECRET_API_KEY")
@@ -593,24 +867,21 @@ class IPFSIntegration:
             }
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            
-            result = response.json()
-            ipfs_hash = result["IpfsHash"]
-            
-            logger.info(f"Metadata uploaded to IPFS: {ipfs_hash}")
-            return f"ipfs://{ipfs_hash}"
+        # Pre-encoded with orjson; httpx sends the bytes as-is
+        response = await self._client.post(url, content=orjson.dumps(payload), headers=headers)
+        response.raise_for_status()
+        
+        result = orjson.loads(response.content)
+        ipfs_hash = result["IpfsHash"]
+        
+        logger.info(f"Metadata uploaded to IPFS: {ipfs_hash}")
+        return f"ipfs://{ipfs_hash}"
     
     async def _mock_ipfs_upload(self, metadata: Dict[str, Any]) -> str:
         """Mock IPFS upload for demo purposes"""
-        import hashlib
-        import json
-        
         # Create a deterministic hash based on metadata content
-        content_str = json.dumps(metadata, sort_keys=True)
-        content_hash = hashlib.sha256(content_str.encode()).hexdigest()[:46]  # IPFS hash length
+        content_bytes = orjson.dumps(metadata, option=orjson.OPT_SORT_KEYS)
+        content_hash = hashlib.sha256(content_bytes).hexdigest()[:46]  # IPFS hash length
         
         # Create a mock IPFS hash that looks realistic
         mock_hash = f"Qm{content_hash}"
@@ -624,7 +895,58 @@ class IPFSIntegration:
             hash_part = ipfs_uri.replace("ipfs://", "")
             return f"{self.gateway}{hash_part}"
         return ipfs_uri
+    
+    async def aclose(self):
+        """Close the pooled client if this instance created it"""
+        if self._owns_client:
+            await self._client.aclose()
+
+
+# Shared IPFS client for callers without their own HTTP pool
+_ipfs_integration: Optional[IPFSIntegration] = None
+
+def get_ipfs_integration(http_client: Optional[httpx.AsyncClient] = None) -> IPFSIntegration:
+    """IPFS helper bound to the given client, or the shared pooled instance"""
+    global _ipfs_integration
+    if http_client is not None:
+        return IPFSIntegration(http_client=http_client)
+    if _ipfs_integration is None:
+        _ipfs_integration = IPFSIntegration()
+    return _ipfs_integration
 
+async def close_ipfs_integration():
+    """Close the shared IPFS client (FastAPI shutdown)"""
+    global _ipfs_integration
+    if _ipfs_integration is not None:
+        await _ipfs_integration.aclose()
+        _ipfs_integration = None
+
+
+# Rarity tiers: a score at or above _RARITY_THRESHOLDS[i] earns _RARITY_NAMES[i + 1]
+_RARITY_THRESHOLDS = (60, 70, 80, 90)
+_RARITY_NAMES = ("Basic", "Common", "Rare", "Epic", "Legendary")
+
+# Enhanced metadata attributes in order: (trait_type, display_type, max_value)
+_ATTR_SCHEMA = (
+    ("Gene Name", None, None),
+    ("Quality Score", "number", 100),
+    ("Confidence", "boost_percentage", None),
+    ("Rarity", None, None),
+    ("Variant Impact", None, None),
+    ("Functional Prediction", None, None),
+    ("Sequence Length", "number", None),
+    ("GC Content", "boost_percentage", None),
+    ("Analysis Date", None, None),
+    ("Platform", None, None),
+)
+
+def _attr(trait_type: str, value: Any, display_type: Optional[str] = None, max_value: Optional[int] = None) -> Dict[str, Any]:
+    attribute = {"trait_type": trait_type, "value": value}
+    if display_type:
+        attribute["display_type"] = display_type
+    if max_value is not None:
+        attribute["max_value"] = max_value
+    return attribute
 
 # Enhanced metadata creation with better structure
 async def create_enhanced_nft_metadata(
@@ -639,16 +961,8 @@ async def create_enhanced_nft_metadata(
     
     # Determine rarity based on quality score
     overall_score = quality_score.get("overall_score", 0)
-    if overall_score >= 90:
-        rarity = "Legendary"
-    elif overall_score >= 80:
-        rarity = "Epic"
-    elif overall_score >= 70:
-        rarity = "Rare"
-    elif overall_score >= 60:
-        rarity = "Common"
-    else:
-        rarity = "Basic"
+    rarity = _RARITY_NAMES[bisect.bisect_right(_RARITY_THRESHOLDS, overall_score)]
+    now = datetime.now()
     
     # Create comprehensive metadata
     metadata = {
@@ -658,58 +972,26 @@ async def create_enhanced_nft_metadata(
         "image": f"https://api.placeholder.com/400x400?text=Genomic+Analysis+NFT",  # TODO: Generate actual image
         "external_url": f"https://your-platform.com/nft/{analysis_data.get('analysis_id')}",
         "attributes": [
-            {
-                "trait_type": "Gene Name",
-                "value": analysis_metadata.get("gene_name", "Unknown")
-            },
-            {
-                "trait_type": "Quality Score",
-                "value": overall_score,
-                "display_type": "number",
-                "max_value": 100
-            },
-            {
-                "trait_type": "Confidence",
-                "value": quality_score.get("confidence", 0),
-                "display_type": "boost_percentage"
-            },
-            {
-                "trait_type": "Rarity",
-                "value": rarity
-            },
-            {
-                "trait_type": "Variant Impact",
-                "value": quality_score.get("variant_impact", "unknown").title()
-            },
-            {
-                "trait_type": "Functional Prediction", 
-                "value": quality_score.get("functional_prediction", "unknown").replace("_", " ").title()
-            },
-            {
-                "trait_type": "Sequence Length",
-                "value": gene_annotations.get("length", 0),
-                "display_type": "number"
-            },
-            {
-                "trait_type": "GC Content",
-                "value": round(gene_annotations.get("gc_content", 0) * 100, 1),
-                "display_type": "boost_percentage"
-            },
-            {
-                "trait_type": "Analysis Date",
-                "value": datetime.now().strftime("%Y-%m-%d")
-            },
-            {
-                "trait_type": "Platform",
-                "value": "BNB Smart Chain"
-            }
+            _attr(trait_type, value, display_type, max_value)
+            for (trait_type, display_type, max_value), value in zip(_ATTR_SCHEMA, (
+                analysis_metadata.get("gene_name", "Unknown"),
+                overall_score,
+                quality_score.get("confidence", 0),
+                rarity,
+                quality_score.get("variant_impact", "unknown").title(),
+                quality_score.get("functional_prediction", "unknown").replace("_", " ").title(),
+                gene_annotations.get("length", 0),
+                round(gene_annotations.get("gc_content", 0) * 100, 1),
+                now.strftime("%Y-%m-%d"),
+                "BNB Smart Chain"
+            ))
         ],
         "properties": {
             "analysis_id": analysis_data.get("analysis_id"),
             "contributor": contributor_address,
             "model": "Evo2",
             "platform": "BNB_Chain",
-            "created_at": datetime.now().isoformat(),
+            "created_at": now.isoformat(),
             "quality_metrics": quality_score,
             "gene_data": gene_annotations
         },
@@ -720,46 +1002,88 @@ async def create_enhanced_nft_metadata(
     return metadata
 
 
-# Update the existing process_nft_minting_with_blockchain to use enhanced metadata
-async def process_nft_minting_with_enhanced_metadata(
+# Single NFT minting flow: metadata -> IPFS -> mint -> (optionally) confirm and reward
+async def mint_and_reward(
     analysis_result: Dict[str, Any],
     contributor_address: str,
-    blockchain_client: BlockchainIntegration
+    *,
+    enhanced: bool = True,
+    with_rewards: bool = True,
+    blockchain_client: Optional[BlockchainIntegration] = None,
+    http_client: Optional[httpx.AsyncClient] = None
 ) -> Dict[str, Any]:
-    """Enhanced NFT minting with comprehensive metadata and IPFS storage"""
+    """
+    Mint a genomic NFT for an analysis
+    
+    Metadata is built and uploaded once. With with_rewards=False the result is
+    returned as soon as the transaction is sent (status "pending"); otherwise the
+    receipt is awaited and both token rewards are distributed after confirmation.
+    """
     try:
-        # Create enhanced metadata
-        metadata = await create_enhanced_nft_metadata(
-            analysis_result, 
-            contributor_address
-        )
+        blockchain_client = blockchain_client or get_blockchain_instance()
+        analysis_metadata = analysis_result["analysis_metadata"]
+        # Normalize once; everything downstream reuses the checksummed form
+        contributor_address = Web3.to_checksum_address(contributor_address)
+        
+        # Create metadata
+        if enhanced:
+            metadata = await create_enhanced_nft_metadata(analysis_result, contributor_address)
+        else:
+            metadata = blockchain_client.create_nft_metadata(
+                analysis_id=analysis_result["analysis_id"],
+                gene_name=analysis_metadata.get("gene_name"),
+                description=analysis_metadata.get("description"),
+                quality_score=analysis_result["quality_score"]["overall_score"],
+                contributor_address=contributor_address,
+                analysis_data=analysis_metadata
+            )
         
         # Upload to IPFS
-        ipfs_client = IPFSIntegration()
+        ipfs_client = get_ipfs_integration(http_client)
         ipfs_uri = await ipfs_client.upload_metadata(metadata)
         
         # Mint NFT on blockchain
         mint_result = await blockchain_client.mint_genomic_nft(
             contributor_address=contributor_address,
             token_uri=ipfs_uri,
-            gene_name=analysis_result["analysis_metadata"].get("gene_name") or "Unknown Gene",
-            description=metadata["description"],
+            gene_name=analysis_metadata.get("gene_name") or "Unknown Gene",
+            description=metadata["description"] or "AI-analyzed genomic sequence",
             ipfs_hash=ipfs_uri.replace("ipfs://", ""),
             quality_score=int(analysis_result["quality_score"]["overall_score"])
         )
         
-        return {
+        result = {
             "minting_successful": mint_result["success"],
+            "status": mint_result.get("status"),
             "transaction_hash": mint_result.get("transaction_hash"),
             "token_id": mint_result.get("token_id"),
             "gas_used": mint_result.get("gas_used"),
             "ipfs_uri": ipfs_uri,
             "metadata": metadata,
-            "ipfs_gateway_url": ipfs_client.get_http_url(ipfs_uri)
+            "ipfs_gateway_url": ipfs_client.get_http_url(ipfs_uri),
+            "error": mint_result.get("error")
         }
         
+        if with_rewards and result["minting_successful"]:
+            receipt_result = await blockchain_client.wait_for_mint_receipt(result["transaction_hash"])
+            result.update(
+                minting_successful=receipt_result["success"],
+                status=receipt_result["status"],
+                token_id=receipt_result.get("token_id"),
+                gas_used=receipt_result.get("gas_used"),
+                error=receipt_result.get("error")
+            )
+            
+            if result["minting_successful"]:
+                # Add reward information to result
+                result["rewards"] = await distribute_minting_rewards(
+                    analysis_result, contributor_address, blockchain_client
+                )
+        
+        return result
+        
     except Exception as e:
-        logger.error(f"Enhanced NFT minting failed: {e}")
+        logger.error(f"NFT minting failed: {e}")
         return {
             "minting_successful": False,
             "error": str(e)
@@ -3,11 +3,21 @@ Enhanced Modal.com Integration for Evo2 Analysis
 Connects FastAPI with your existing Modal.com Evo2 setup
 """
 import os
+import time
+import hashlib
 import logging
 import asyncio
-import requests
-from typing import Dict, Any, Optional
-import json
+import gzip
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import cache
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+import orjson
+
+from _fallback_kernel import IMPACTS, compute, seq_stats
 
 try:
     import modal
@@ -22,6 +32,113 @@ MODAL_APP_NAME = "variant-analysis-evo2-BNB"
 
 # Modal.com deployed URL (if using web endpoints)
 MODAL_EVO2_URL = "https://pratikrai0101--variant-analysis-evo2-bnb-evo2model-analy-620a32.modal.run/"
+_MODAL_ENDPOINT = MODAL_EVO2_URL.rstrip('/')  # The endpoint itself is the analyze_sequence function
+
+# Request bodies at least this large are gzipped before upload
+MODAL_GZIP_MIN_BYTES = 1024
+
+# Retry policy for transient Modal failures (exponential backoff)
+MODAL_MAX_ATTEMPTS = int(os.getenv("MODAL_MAX_ATTEMPTS", "3"))
+MODAL_RETRY_BASE_DELAY = 0.5
+MODAL_RETRY_MAX_DELAY = 10.0
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Genes routed to variant analysis by analyze_cancer_gene
+_CANCER_GENES = frozenset({'BRCA1', 'BRCA2', 'TP53', 'EGFR', 'KRAS', 'PIK3CA'})
+
+# Genes whose local fallback score gets a small boost
+_BOOST_GENES = frozenset({'BRCA1', 'BRCA2', 'TP53', 'EGFR'})
+
+# Max in-flight HTTP calls to Modal per process, shared by single and batch analyses
+MODAL_CONCURRENCY = int(os.getenv("MODAL_CONCURRENCY", "16"))
+
+# Identical (sequence, gene, type) analyses are answered from memory for this long
+MODAL_CACHE_SIZE = int(os.getenv("MODAL_CACHE_SIZE", "2048"))
+MODAL_CACHE_TTL_SECONDS = int(os.getenv("MODAL_CACHE_TTL_SECONDS", "3600"))
+
+# Second cache tier on disk, shared by API workers and kept across restarts ("" disables)
+MODAL_DISK_CACHE_PATH = os.getenv("MODAL_DISK_CACHE_PATH", "/tmp/evo2_modal_cache.sqlite3")
+
+# IUPAC codes the Modal endpoint accepts (it rejects anything else with a 500)
+_IUPAC_DNA = b'ACGTNRYSWKMBDHV-acgtnryswkmbdhv'
+
+# Modal prediction labels (as emitted by main.analyze_variant) -> (variant_impact, functional_prediction)
+_PREDICTION_MAP = {
+    "Likely Pathogenic": ("high", "likely_pathogenic"),
+    "Likely benign": ("low", "likely_benign"),
+    None: ("moderate", "uncertain_significance"),
+}
+
+def _is_valid_dna(sequence: str) -> bool:
+    # translate() deletes every allowed byte in one C pass; anything left is invalid
+    return not sequence.encode('ascii', 'replace').translate(None, _IUPAC_DNA)
+
+def _cache_key(sequence: str, gene_name: Optional[str], analysis_type: str) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    h.update((gene_name or "").encode())
+    h.update(b"\0")
+    h.update(analysis_type.encode())
+    h.update(b"\0")
+    h.update(sequence.encode())
+    return h.digest()
+
+# Shared pooled client for Modal HTTP calls, created lazily on first use
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+def _get_http() -> httpx.AsyncClient:
+    """Return the shared Modal HTTP client, reusing keep-alive connections"""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60),
+        )
+    return _HTTP_CLIENT
+
+class ModalResultDiskCache:
+    """SQLite-backed result cache; blocking calls are meant to run in a worker thread"""
+    
+    def __init__(self, path: str, ttl: int = MODAL_CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            # WAL lets several API worker processes read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, expires_at REAL NOT NULL, payload BLOB NOT NULL)"
+            )
+            conn.execute("DELETE FROM results WHERE expires_at < ?", (time.time(),))
+            self._conn = conn
+        return self._conn
+    
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT payload FROM results WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return orjson.loads(row[0]) if row else None
+    
+    def put(self, key: bytes, result: Dict[str, Any]) -> None:
+        payload = orjson.dumps(result)
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO results (key, expires_at, payload) VALUES (?, ?, ?)",
+                (key, time.time() + self.ttl, payload),
+            )
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class ModalTransientError(Exception):
+    """Modal returned a status worth retrying (rate limited / temporarily unavailable)"""
 
 class ModalEvo2Client:
     """Client for interacting with Modal.com Evo2 functions"""
@@ -29,6 +146,12 @@ class ModalEvo2Client:
     def __init__(self):
         self.modal_available = modal is not None
         self.app = None  # Skip Modal app connection for now, use HTTP endpoint directly
+        self._semaphore = asyncio.Semaphore(MODAL_CONCURRENCY)
+        # TTL-LRU of successful Modal results: key -> (expires_at, result)
+        self._cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Misses currently being fetched, so concurrent identical requests share one call
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        self._disk = ModalResultDiskCache(MODAL_DISK_CACHE_PATH) if MODAL_DISK_CACHE_PATH else None
         
         if self.modal_available:
             logger.info("✅ Modal package available, using HTTP endpoint for AI calls")
@@ -44,16 +167,114 @@ class ModalEvo2Client:
         """
         Analyze genomic sequence using your REAL Modal.com Evo2 setup
         """
+        # Modal would reject this anyway; skip the round trip (and its retries)
+        if not _is_valid_dna(sequence):
+            logger.warning("⚠️ Sequence has non-IUPAC characters, skipping Modal")
+            return await self._local_analysis_fallback(sequence, gene_name)
+        
+        key = _cache_key(sequence, gene_name, analysis_type)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            # Memory -> disk -> Modal, writing through on a fresh result
+            result = await self._disk_get(key)
+            from_disk = result is not None
+            if not from_disk:
+                result = await self._analyze_uncached(sequence, gene_name, analysis_type)
+        except Exception as exc:
+            # Followers see the leader's error; retrieving it here keeps asyncio from
+            # logging "exception was never retrieved" when nobody was waiting
+            future.set_exception(exc)
+            future.exception()
+            raise
+        except BaseException:
+            # Only real cancellation (or interpreter exit) cancels the followers
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+        future.set_result(result)
+        
+        # Fallback results stand in for an outage; don't pin them for the TTL
+        if result.get("gene_annotations", {}).get("analysis_method") != "local_fallback":
+            self._cache_put(key, result)
+            if not from_disk:
+                await self._disk_put(key, result)
+        return result
+    
+    async def _disk_get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        if self._disk is None:
+            return None
+        try:
+            return await asyncio.to_thread(self._disk.get, key)
+        except (sqlite3.Error, orjson.JSONDecodeError) as e:
+            logger.warning(f"⚠️ Modal disk cache read failed: {e}")
+            return None
+    
+    async def _disk_put(self, key: bytes, result: Dict[str, Any]) -> None:
+        if self._disk is None:
+            return
+        try:
+            await asyncio.to_thread(self._disk.put, key, result)
+        except (sqlite3.Error, TypeError) as e:
+            logger.warning(f"⚠️ Modal disk cache write failed: {e}")
+    
+    def _cache_get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return result
+    
+    def _cache_put(self, key: bytes, result: Dict[str, Any]) -> None:
+        self._cache[key] = (time.monotonic() + MODAL_CACHE_TTL_SECONDS, result)
+        self._cache.move_to_end(key)
+        if len(self._cache) > MODAL_CACHE_SIZE:
+            self._cache.popitem(last=False)
+    
+    async def _analyze_uncached(
+        self,
+        sequence: str,
+        gene_name: Optional[str],
+        analysis_type: str
+    ) -> Dict[str, Any]:
         try:
             # Force HTTP endpoint usage for now (skip Modal app connection issues)
-            logger.info(f"🌐 Calling REAL Evo2 model via HTTP endpoint for {gene_name or 'unknown gene'}")
-            return await self._call_modal_http_endpoint(sequence, gene_name, analysis_type)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"🌐 Calling REAL Evo2 model via HTTP endpoint for {gene_name or 'unknown gene'}")
+            return await self._call_with_retries(self._call_modal_http_endpoint, sequence, gene_name, analysis_type)
             
         except Exception as e:
             logger.error(f"❌ Modal analysis failed: {e}")
             logger.info("🔄 Falling back to local analysis")
             return await self._local_analysis_fallback(sequence, gene_name)
     
+    async def _call_with_retries(self, call, *args) -> Dict[str, Any]:
+        """Retry transient Modal failures with exponential backoff"""
+        for attempt in range(1, MODAL_MAX_ATTEMPTS + 1):
+            try:
+                # Hold a slot per attempt only, so backoff sleeps don't starve other callers
+                async with self._semaphore:
+                    return await call(*args)
+            except (httpx.TransportError, asyncio.TimeoutError, ModalTransientError) as e:
+                if attempt == MODAL_MAX_ATTEMPTS:
+                    raise
+                delay = min(MODAL_RETRY_BASE_DELAY * 2 ** (attempt - 1), MODAL_RETRY_MAX_DELAY)
+                logger.warning(f"⚠️ Modal call failed (attempt {attempt}/{MODAL_MAX_ATTEMPTS}): {e}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
     async def _call_modal_app_function(self, sequence: str, gene_name: Optional[str], analysis_type: str) -> Dict[str, Any]:
         """Call your real Modal.com app function"""
         try:
@@ -83,34 +304,35 @@ class ModalEvo2Client:
     async def _call_modal_http_endpoint(self, sequence: str, gene_name: Optional[str], analysis_type: str) -> Dict[str, Any]:
         """Call your Modal.com HTTP endpoint"""
         try:
-            # Prepare request for your NEW Modal sequence analysis endpoint
-            # Modal FastAPI endpoints expect query parameters
-            params = {
+            # Prepare request for your NEW Modal sequence analysis endpoint: a JSON body,
+            # gzipped once it's big enough for DNA's ~3-4x compression to pay off
+            body = orjson.dumps({
                 "sequence": sequence,
                 "gene_name": gene_name or ""
-            }
+            })
+            headers = {"Content-Type": "application/json"}
+            if len(body) >= MODAL_GZIP_MIN_BYTES:
+                body = gzip.compress(body, compresslevel=5)
+                headers["Content-Encoding"] = "gzip"
             
             # Make HTTP request to the new analyze_sequence endpoint
-            endpoint_url = MODAL_EVO2_URL.rstrip('/')  # The endpoint itself is the analyze_sequence function
-            
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                async with session.post(endpoint_url, params=params, timeout=60) as response:
-                    if response.status == 200:
-                        modal_result = await response.json()
-                        logger.info(f"✅ Successfully called REAL Evo2 AI model via Modal.com!")
-                        logger.info(f"🎯 Analysis method: {modal_result.get('gene_annotations', {}).get('analysis_method', 'unknown')}")
-                        return modal_result  # The new endpoint returns data in our format already
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Modal HTTP endpoint failed: {response.status} - {error_text}")
-                        raise Exception(f"Modal HTTP endpoint failed: {response.status} - {error_text}")
+            response = await _get_http().post(_MODAL_ENDPOINT, content=body, headers=headers)
+            if response.status_code == 200:
+                modal_result = orjson.loads(response.content)
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("✅ Successfully called REAL Evo2 AI model via Modal.com!")
+                    logger.info(f"🎯 Analysis method: {modal_result.get('gene_annotations', {}).get('analysis_method', 'unknown')}")
+                return modal_result  # The new endpoint returns data in our format already
+            else:
+                error_text = response.text
+                logger.error(f"❌ Modal HTTP endpoint failed: {response.status_code} - {error_text}")
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise ModalTransientError(f"Modal HTTP endpoint failed: {response.status_code} - {error_text}")
+                raise Exception(f"Modal HTTP endpoint failed: {response.status_code} - {error_text}")
                         
         except Exception as e:
             logger.error(f"❌ Modal HTTP endpoint call failed: {e}")
             raise
-            logger.error(f"Modal HTTP endpoint call failed: {e}")
-            raise
     
     def _convert_modal_result_to_api_format(self, modal_result: Dict, sequence: str, gene_name: Optional[str]) -> Dict[str, Any]:
         """Convert Modal.com result to our API format"""
@@ -120,25 +342,25 @@ class ModalEvo2Client:
             prediction = modal_result.get("prediction", "Unknown")
             confidence = modal_result.get("classification_confidence", 0.5)
             
-            # Convert prediction to our format
-            if "pathogenic" in prediction.lower():
-                variant_impact = "high"
-                functional_prediction = "likely_pathogenic"
+            # Convert prediction to our format (exact labels first, substring match for anything else)
+            mapped = _PREDICTION_MAP.get(prediction)
+            if mapped is None:
+                lowered = prediction.lower()
+                mapped = _PREDICTION_MAP["Likely Pathogenic" if "pathogenic" in lowered
+                                         else "Likely benign" if "benign" in lowered
+                                         else None]
+            variant_impact, functional_prediction = mapped
+            
+            if variant_impact == "high":
                 # Higher delta score (more negative) = higher quality score
                 overall_score = max(0, min(100, 85 + (delta_score * 1000)))
-            elif "benign" in prediction.lower():
-                variant_impact = "low"
-                functional_prediction = "likely_benign"
+            elif variant_impact == "low":
                 overall_score = max(0, min(100, 70 + abs(delta_score * 1000)))
             else:
-                variant_impact = "moderate"
-                functional_prediction = "uncertain_significance"
                 overall_score = 60
             
             # Calculate sequence properties for additional context
-            length = len(sequence)
-            gc_content = (sequence.count('G') + sequence.count('C')) / length if length > 0 else 0
-            complexity = len(set(sequence)) / 4
+            length, gc_content, complexity = seq_stats(sequence)
             
             return {
                 "quality_score": {
@@ -171,30 +393,14 @@ class ModalEvo2Client:
     
     def _create_local_fallback_result(self, sequence: str, gene_name: Optional[str]) -> Dict[str, Any]:
         """Create a local fallback result when Modal is unavailable"""
-        length = len(sequence)
-        gc_content = (sequence.count('G') + sequence.count('C')) / length if length > 0 else 0
-        complexity = len(set(sequence)) / 4
-        
-        # Basic scoring
-        length_score = min(length / 2000, 1.0) * 35
-        gc_score = (1 - abs(gc_content - 0.5) * 2) * 30
-        complexity_score = complexity * 35
-        overall_score = length_score + gc_score + complexity_score
+        # Basic scoring (histogram + arithmetic, JIT-compiled when numba is installed)
+        length, gc_content, complexity = seq_stats(sequence)
+        gene_bonus = 5.0 if gene_name and gene_name.upper() in _BOOST_GENES else 0.0
         
-        if gene_name and gene_name.upper() in ['BRCA1', 'BRCA2', 'TP53', 'EGFR']:
-            overall_score += 5
-        
-        confidence = min(overall_score / 100, 0.95)
-        
-        if overall_score > 85:
-            variant_impact = "high"
-            functional_prediction = "likely_pathogenic"
-        elif overall_score > 65:
-            variant_impact = "moderate" 
-            functional_prediction = "uncertain_significance"
-        else:
-            variant_impact = "low"
-            functional_prediction = "likely_benign"
+        overall_score, confidence, length_score, gc_score, complexity_score, impact_code = compute(
+            length, gc_content, complexity, gene_bonus
+        )
+        variant_impact, functional_prediction = IMPACTS[impact_code]
         
         return {
             "quality_score": {
@@ -224,18 +430,24 @@ class ModalEvo2Client:
         Fallback analysis when Modal.com is not available
         """
         logger.warning("🔄 Using local analysis fallback - Modal.com not available")
-        await asyncio.sleep(0.5)  # Simulate some processing time
         return self._create_local_fallback_result(sequence, gene_name)
 
-# Global client instance
-_modal_client = None
-
+@cache
 def get_modal_client() -> ModalEvo2Client:
-    """Get Modal client instance"""
-    global _modal_client
-    if _modal_client is None:
-        _modal_client = ModalEvo2Client()
-    return _modal_client
+    """Get the shared Modal client instance"""
+    return ModalEvo2Client()
+
+async def close_modal_client() -> None:
+    """Close the shared Modal HTTP client and disk cache (called on FastAPI shutdown)"""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
+    # Only touch the client if one was ever created
+    if get_modal_client.cache_info().currsize:
+        client = get_modal_client()
+        if client._disk is not None:
+            client._disk.close()
 
 # Integration function for the FastAPI app
 async def run_evo2_analysis(
@@ -254,14 +466,13 @@ async def run_evo2_analysis(
 async def run_batch_analysis(sequences: list, gene_names: list = None) -> list:
     """Run analysis on multiple sequences"""
     client = get_modal_client()
-    results = []
-    
-    for i, sequence in enumerate(sequences):
-        gene_name = gene_names[i] if gene_names and i < len(gene_names) else None
-        result = await client.analyze_sequence(sequence, gene_name)
-        results.append(result)
     
-    return results
+    # The client caps in-flight Modal calls; analyze_sequence falls back locally on
+    # failure, so one bad call can't sink the batch
+    return await asyncio.gather(*(
+        client.analyze_sequence(sequence, gene_names[i] if gene_names and i < len(gene_names) else None)
+        for i, sequence in enumerate(sequences)
+    ))
 
 # Specialized analysis functions
 async def analyze_brca_variant(sequence: str) -> Dict[str, Any]:
@@ -270,6 +481,5 @@ async def analyze_brca_variant(sequence: str) -> Dict[str, Any]:
 
 async def analyze_cancer_gene(sequence: str, gene_name: str) -> Dict[str, Any]:
     """Specialized cancer gene analysis"""
-    cancer_genes = ['BRCA1', 'BRCA2', 'TP53', 'EGFR', 'KRAS', 'PIK3CA']
-    analysis_type = "variant_analysis" if gene_name.upper() in cancer_genes else "quality_score"
+    analysis_type = "variant_analysis" if gene_name.upper() in _CANCER_GENES else "quality_score"
     return await run_evo2_analysis(sequence, gene_name, analysis_type)
@@ -9,16 +9,42 @@ import os
 import signal
 import time
 
+from start_api import PID_FILE
+
+def wait_for_exit(pid, timeout=5.0):
+    """Poll until the process is gone (POSIX); returns False on timeout"""
+    if os.name == "nt":
+        # os.kill with SIGTERM is TerminateProcess on Windows, and signal 0 isn't a probe there
+        return True
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.05)
+    return False
+
 def kill_existing_processes():
-    """Kill any existing API server processes"""
+    """Stop the API server recorded in the PID file, if it is still running"""
+    try:
+        pid = int(PID_FILE.read_text())
+    except (FileNotFoundError, ValueError):
+        print("ℹ️ No running API server recorded")
+        return
+    
     try:
-        # Kill any existing Python processes running on port 8001
-        subprocess.run(["taskkill", "/f", "/im", "python.exe"], 
-                      capture_output=True, text=True)
-        print("✅ Cleaned up existing processes")
-        time.sleep(2)
+        os.kill(pid, signal.SIGTERM)
+        if wait_for_exit(pid):
+            print(f"✅ Stopped API server (pid {pid})")
+        else:
+            print(f"⚠️ API server (pid {pid}) did not exit within 5s")
+    except ProcessLookupError:
+        print("ℹ️ Recorded API server was not running")
     except Exception as e:
         print(f"⚠️ Cleanup warning: {e}")
+    finally:
+        PID_FILE.unlink(missing_ok=True)
 
 def start_server():
     """Start the API server fresh"""
@@ -4,7 +4,10 @@ Startup script for Evo2 Genomic Analysis API
 """
 import os
 import sys
+import atexit
 import logging
+import tempfile
+from importlib.util import find_spec
 from pathlib import Path
 
 # Add current directory to Python path
@@ -16,6 +19,14 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Written by whichever process launches uvicorn so restart_server.py can stop just that server
+PID_FILE = Path(tempfile.gettempdir()) / "evo2_api.pid"
+
+def write_pid_file():
+    """Record this process's PID, removing the file again on exit"""
+    PID_FILE.write_text(str(os.getpid()))
+    atexit.register(PID_FILE.unlink, missing_ok=True)
+
 def setup_environment():
     """Setup environment variables"""
     
@@ -48,10 +59,9 @@ def check_dependencies():
     
     missing_packages = []
     
+    # find_spec only locates the package; importing it here would run its module code
     for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
+        if find_spec(package) is None:
             missing_packages.append(package)
     
     if missing_packages:
@@ -72,9 +82,8 @@ def main():
     # Setup environment
     setup_environment()
     
-    # Check dependencies
-    if not check_dependencies():
-        sys.exit(1)
+    # Dependencies are reported from the app's startup event; a missing one
+    # fails the uvicorn import below anyway
     
     # Import and run the API
     try:
@@ -89,6 +98,7 @@ def main():
         print(f"📚 API Documentation: http://localhost:{port}/docs")
         print("🔄 Starting server...")
         
+        write_pid_file()
         uvicorn.run(
             "api_server:app",
             host=host,
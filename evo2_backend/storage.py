@@ -0,0 +1,121 @@
+"""
+Analysis Storage Module
+Redis-backed persistence for analysis results shared across API workers
+"""
+import os
+import logging
+from typing import Optional, List, Tuple
+from datetime import datetime
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Analyses expire after a day unless configured otherwise
+ANALYSIS_TTL_SECONDS = int(os.getenv("ANALYSIS_TTL_SECONDS", "86400"))
+
+# Sorted set of analysis IDs scored by creation timestamp
+ANALYSIS_INDEX_KEY = "analyses"
+
+
+def _analysis_key(analysis_id: str) -> str:
+    return f"analysis:{analysis_id}"
+
+
+def _mint_status_key(analysis_id: str) -> str:
+    return f"analysis:{analysis_id}:mint_status"
+
+
+def _mint_tx_key(tx_hash: str) -> str:
+    # Hashes arrive with or without the 0x prefix depending on the hexbytes version
+    return f"mint:{tx_hash.lower().removeprefix('0x')}"
+
+
+class RedisStore:
+    """Cache-aside store for AnalysisResult payloads keyed by analysis_id"""
+
+    def __init__(self, url: str = REDIS_URL, ttl: int = ANALYSIS_TTL_SECONDS):
+        self.pool = redis.ConnectionPool.from_url(url, decode_responses=True)
+        self.redis = redis.Redis(connection_pool=self.pool)
+        self.ttl = ttl
+
+    async def save_analysis(self, analysis_id: str, payload: str, timestamp: datetime) -> None:
+        """Store a serialized analysis and index it by timestamp"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(_analysis_key(analysis_id), payload, ex=self.ttl)
+            pipe.zadd(ANALYSIS_INDEX_KEY, {analysis_id: timestamp.timestamp()})
+            # Drop index entries whose payloads have already expired
+            pipe.zremrangebyscore(ANALYSIS_INDEX_KEY, "-inf", f"({timestamp.timestamp() - self.ttl}")
+            await pipe.execute()
+
+    async def get_analysis(self, analysis_id: str) -> Optional[str]:
+        """Return the serialized analysis or None if missing/expired"""
+        return await self.redis.get(_analysis_key(analysis_id))
+
+    async def get_analysis_with_mint_status(self, analysis_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return (analysis, mint status) payloads in one round trip"""
+        analysis, mint_status = await self.redis.mget(
+            [_analysis_key(analysis_id), _mint_status_key(analysis_id)]
+        )
+        return analysis, mint_status
+
+    async def set_mint_status(self, analysis_id: str, tx_hash: str, payload: str) -> None:
+        """Store the serialized mint status, addressable by analysis ID and by tx hash"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(_mint_status_key(analysis_id), payload, ex=self.ttl)
+            pipe.set(_mint_tx_key(tx_hash), payload, ex=self.ttl)
+            await pipe.execute()
+
+    async def get_mint_status_by_tx(self, tx_hash: str) -> Optional[str]:
+        """Return the serialized mint status for a transaction or None if unknown"""
+        return await self.redis.get(_mint_tx_key(tx_hash))
+
+    async def list_analyses(self, limit: int = 10, offset: int = 0) -> List[str]:
+        """Return serialized analyses, newest first"""
+        if limit <= 0:
+            return []
+
+        analysis_ids = await self.redis.zrevrange(ANALYSIS_INDEX_KEY, offset, offset + limit - 1)
+        if not analysis_ids:
+            return []
+
+        payloads = await self.redis.mget([_analysis_key(i) for i in analysis_ids])
+        return [p for p in payloads if p is not None]
+
+    async def close(self) -> None:
+        """Release pooled connections"""
+        await self.redis.aclose()
+        await self.pool.disconnect()
+
+
+_store: Optional[RedisStore] = None
+
+
+async def init_store() -> RedisStore:
+    """Create the shared store (called on FastAPI startup)"""
+    global _store
+    if _store is None:
+        _store = RedisStore()
+        try:
+            await _store.redis.ping()
+            logger.info(f"Connected to Redis at {REDIS_URL}")
+        except Exception as e:
+            logger.warning(f"Redis not reachable at {REDIS_URL}: {e}")
+    return _store
+
+
+def get_store() -> RedisStore:
+    """Get the shared store instance"""
+    if _store is None:
+        raise RuntimeError("Analysis store not initialized")
+    return _store
+
+
+async def close_store() -> None:
+    """Close the shared store (called on FastAPI shutdown)"""
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
@@ -4,71 +4,58 @@ Quick test script for the Evo2 API endpoints
 """
 import httpx
 import asyncio
-import json
-from typing import Dict, Any
 
 API_BASE_URL = "http://localhost:8000"
 
-async def test_health_check():
+async def check_health(client: httpx.AsyncClient):
     """Test the health check endpoint"""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"{API_BASE_URL}/health")
-            print(f"✅ Health Check: {response.status_code}")
-            print(f"   Response: {response.json()}")
-            return response.status_code == 200
-        except Exception as e:
-            print(f"❌ Health Check Failed: {e}")
-            return False
+    try:
+        response = await client.get("/health")
+        print(f"✅ Health Check: {response.status_code}")
+        print(f"   Response: {response.json()}")
+        return response.status_code == 200
+    except Exception as e:
+        print(f"❌ Health Check Failed: {e}")
+        return False
 
-async def test_analyze_sequence():
+async def check_analyze_sequence(client: httpx.AsyncClient):
     """Test the sequence analysis endpoint"""
-    async with httpx.AsyncClient() as client:
-        try:
-            # Test data
-            test_sequence = "ATCGATCGATCGATCG"
-            payload = {
-                "sequence": test_sequence,
-                "sequence_type": "DNA",
-                "analysis_type": "variant_analysis"
-            }
-            
-            response = await client.post(
-                f"{API_BASE_URL}/api/analyze", 
-                json=payload,
-                timeout=30.0
-            )
-            print(f"✅ Sequence Analysis: {response.status_code}")
-            print(f"   Response: {response.json()}")
-            return response.status_code == 200
-        except Exception as e:
-            print(f"❌ Sequence Analysis Failed: {e}")
-            return False
+    try:
+        # Test data
+        test_sequence = "ATCGATCGATCGATCG"
+        payload = {
+            "sequence": test_sequence,
+            "sequence_type": "DNA",
+            "analysis_type": "variant_analysis"
+        }
+        
+        response = await client.post("/api/analyze", json=payload)
+        print(f"✅ Sequence Analysis: {response.status_code}")
+        print(f"   Response: {response.json()}")
+        return response.status_code == 200
+    except Exception as e:
+        print(f"❌ Sequence Analysis Failed: {e}")
+        return False
 
-async def test_nft_mint():
+async def check_nft_mint(client: httpx.AsyncClient):
     """Test the NFT minting endpoint (without actual minting)"""
-    async with httpx.AsyncClient() as client:
-        try:
-            payload = {
-                "sequence": "ATCGATCGATCGATCG",
-                "analysis_result": {"quality_score": 0.85, "variants": []},
-                "metadata": {
-                    "name": "Test Genomic Data",
-                    "description": "Test genomic sequence for API validation"
-                }
+    try:
+        payload = {
+            "sequence": "ATCGATCGATCGATCG",
+            "analysis_result": {"quality_score": 0.85, "variants": []},
+            "metadata": {
+                "name": "Test Genomic Data",
+                "description": "Test genomic sequence for API validation"
             }
-            
-            response = await client.post(
-                f"{API_BASE_URL}/api/mint-nft", 
-                json=payload,
-                timeout=30.0
-            )
-            print(f"✅ NFT Mint Endpoint: {response.status_code}")
-            print(f"   Response: {response.json()}")
-            return True  # May fail due to missing private key, but endpoint should exist
-        except Exception as e:
-            print(f"⚠️  NFT Mint Test: {e}")
-            return True  # Expected to fail without proper config
+        }
+        
+        response = await client.post("/api/mint-nft", json=payload)
+        print(f"✅ NFT Mint Endpoint: {response.status_code}")
+        print(f"   Response: {response.json()}")
+        return True  # May fail due to missing private key, but endpoint should exist
+    except Exception as e:
+        print(f"⚠️  NFT Mint Test: {e}")
+        return True  # Expected to fail without proper config
 
 async def run_all_tests():
     """Run all API tests"""
@@ -76,20 +63,22 @@ async def run_all_tests():
     print("=" * 50)
     
     tests = [
-        ("Health Check", test_health_check()),
-        ("Sequence Analysis", test_analyze_sequence()),
-        ("NFT Mint Endpoint", test_nft_mint())
+        ("Health Check", check_health),
+        ("Sequence Analysis", check_analyze_sequence),
+        ("NFT Mint Endpoint", check_nft_mint)
     ]
     
+    # One pooled client for every test; the tests are independent, so run them together
+    print(f"\n🔍 Testing {', '.join(name for name, _ in tests)}...")
+    async with httpx.AsyncClient(base_url=API_BASE_URL, timeout=30.0) as client:
+        outcomes = await asyncio.gather(*(test(client) for _, test in tests), return_exceptions=True)
+    
     results = []
-    for test_name, test_coro in tests:
-        print(f"\n🔍 Testing {test_name}...")
-        try:
-            result = await test_coro
-            results.append((test_name, result))
-        except Exception as e:
-            print(f"❌ {test_name} Error: {e}")
-            results.append((test_name, False))
+    for (test_name, _), outcome in zip(tests, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"❌ {test_name} Error: {outcome}")
+            outcome = False
+        results.append((test_name, outcome))
     
     print("\n" + "=" * 50)
     print("📊 Test Results Summary:")
@@ -0,0 +1,76 @@
+"""
+Tests for the nonce resync path in BlockchainIntegration.send_transaction
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from blockchain import BlockchainIntegration, NonceManager
+
+SENDER = "0x0000000000000000000000000000000000000001"
+
+
+class FakeEth:
+    """Stands in for w3.eth: a fixed pending count and a scripted send_raw_transaction"""
+    
+    def __init__(self, pending_count, send_errors):
+        self.pending_count = pending_count
+        self.send_errors = list(send_errors)
+        self.sent_nonces = []
+    
+    async def get_transaction_count(self, address, block_identifier):
+        return self.pending_count
+    
+    async def send_raw_transaction(self, raw_transaction):
+        self.sent_nonces.append(raw_transaction)
+        if self.send_errors:
+            raise self.send_errors.pop(0)
+        return f"0xhash{raw_transaction}"
+
+
+def make_client(eth):
+    """BlockchainIntegration wired to a fake node, skipping provider and contract setup"""
+    w3 = SimpleNamespace(eth=eth)
+    client = BlockchainIntegration.__new__(BlockchainIntegration)
+    client.w3 = w3
+    client.account = object()
+    client.address_checksum = SENDER
+    # "Signing" just carries the nonce through so the test can see what was sent
+    client._sign = lambda tx: SimpleNamespace(raw_transaction=tx["nonce"])
+    client.nonces = NonceManager(w3, SENDER)
+    return client
+
+
+@pytest.mark.parametrize("message", [
+    "nonce too low",
+    "already known",
+    "replacement transaction underpriced",
+])
+def test_send_transaction_resyncs_nonce(message):
+    eth = FakeEth(pending_count=7, send_errors=[ValueError({"code": -32000, "message": message})])
+    client = make_client(eth)
+    client.nonces.seed(3)
+    
+    async def run():
+        nonce = await client.get_next_nonce()
+        return await client.send_transaction({"nonce": nonce})
+    
+    tx_hash = asyncio.run(run())
+    
+    # Stale nonce rejected, counter resynced from the node's pending count, retried once
+    assert eth.sent_nonces == [3, 7]
+    assert tx_hash == "0xhash7"
+    assert client.nonces._nonce == 8
+
+
+def test_send_transaction_reraises_other_errors():
+    eth = FakeEth(pending_count=7, send_errors=[ValueError("insufficient funds for gas")])
+    client = make_client(eth)
+    client.nonces.seed(3)
+    
+    with pytest.raises(ValueError, match="insufficient funds"):
+        asyncio.run(client.send_transaction({"nonce": 3}))
+    
+    assert eth.sent_nonces == [3]
+    assert client.nonces._nonce == 3